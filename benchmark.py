@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for the review analysis pipeline.
+
+Generates deterministic synthetic Trustpilot / App Store reviews (see synthetic_reviews.py)
+at one or more scales and times the same pandas operations the pipeline scripts run:
+CSV loading (raw vs. review_sources adapters, with --csv-dir), tokenization,
+n-gram counting, sentence expansion, summary statistics, monthly trend
+aggregation, batched classification against a stub zero-shot model, and LLM
+classification against a local fake OpenAI-compatible server (fake_llm_server.py).
+
+Every scale is saved as one JSON file in `benchmarks/` via stage_metrics.RunMetrics.
+
+Usage:
+    python benchmark.py --scales 10000 100000 1000000
+    python benchmark.py --scales 10000 --llm-requests 500 --llm-latency 0.2 --llm-error-rate 0.05
+    python benchmark.py --compare benchmarks/old.json benchmarks/new.json
+"""
+
+import argparse
+import json
+import platform
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from classification_schema import ClassificationParseError, ClassificationSchema, parse_classification
+from fake_llm_server import FakeLLMServer
+from review_sources import SOURCE_ADAPTERS, load_combined_reviews
+from stage_metrics import RunMetrics
+from synthetic_reviews import generate_appstore_reviews, generate_trustpilot_reviews, write_synthetic_exports
+
+DEFAULT_SCALES = [10_000, 100_000, 1_000_000]
+BENCHMARK_DIR = "benchmarks"
+PROMPT_PATH = "prompts/message_sentiments_prompt.md"
+
+# Same stop word list as main.py, CELL 7
+STOP_WORDS = [
+    'i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', 'your', 'yours',
+    'yourself', 'yourselves', 'he', 'him', 'his', 'himself', 'she', 'her', 'hers',
+    'herself', 'it', 'its', 'itself', 'they', 'them', 'their', 'theirs', 'themselves',
+    'what', 'which', 'who', 'whom', 'this', 'that', 'these', 'those', 'am', 'is', 'are',
+    'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'having', 'do', 'does',
+    'did', 'doing', 'a', 'an', 'the', 'and', 'but', 'if', 'or', 'because', 'as', 'until',
+    'while', 'of', 'at', 'by', 'for', 'with', 'about', 'against', 'between', 'into',
+    'through', 'during', 'before', 'after', 'above', 'below', 'to', 'from', 'up', 'down',
+    'in', 'out', 'on', 'off', 'over', 'under', 'again', 'further', 'then', 'once', 'here',
+    'there', 'when', 'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more',
+    'most', 'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so',
+    'than', 'too', 'very', 's', 't', 'can', 'will', 'just', 'don', 'should', 'now', 'd',
+    'll', 'm', 'o', 're', 've', 'y', 'ain', 'aren', 'couldn', 'didn', 'doesn', 'hadn',
+    'hasn', 'haven', 'isn', 'ma', 'mightn', 'mustn', 'needn', 'shan', 'shouldn', 'wasn',
+    'weren', 'won', 'wouldn', 'app', 'headway'
+]
+
+# Main topics from custom_topic_classification.py
+MAIN_TOPICS = [
+    "App Functionality & User Experience (UX/UI)", "Content Quality & Variety",
+    "Pricing, Subscription & Billing Issues", "Customer Support Experience",
+    "Personal Growth & Learning Experience", "Audio Features & Narration", "Language & Localization",
+]
+
+
+def expand_sentences(combined_reviews_df):
+    """Sentence expansion from simple-murat.ipynb"""
+    df_to_expand = combined_reviews_df[combined_reviews_df['description'].str.strip() != ''].copy()
+    df_to_expand['sentence_list'] = df_to_expand['description'].str.split(r'(?<=[.!?])\s+|\n+')
+    expanded_df = df_to_expand.explode('sentence_list')
+    expanded_df.rename(columns={'sentence_list': 'sentence'}, inplace=True)
+    expanded_df.drop(columns=['description'], inplace=True)
+    expanded_df['sentence'] = expanded_df['sentence'].str.strip()
+    expanded_df.dropna(subset=['sentence'], inplace=True)
+    expanded_df = expanded_df[expanded_df['sentence'] != '']
+    return expanded_df.reset_index(drop=True)
+
+
+def count_ngrams(words):
+    """Unigram and bigram counting from main.py analyze_text_column()"""
+    words = words[~words.isin(STOP_WORDS)]
+    unigram_counts = Counter(words)
+    bigrams = list(zip(words, words.shift(-1)))
+    bigrams = [b for b in bigrams if not pd.isna(b[1])]
+    bigram_counts = Counter(bigrams)
+    return unigram_counts, bigram_counts
+
+
+def monthly_trends(df):
+    """Monthly rating aggregation from main.py analyze_time_trends()"""
+    temp_df = df[['date_comment', 'rating']].copy()
+    temp_df['date_comment'] = pd.to_datetime(temp_df['date_comment'], errors='coerce', utc=True).dt.tz_localize(None)
+    temp_df = temp_df.dropna()
+    temp_df['month'] = temp_df['date_comment'].dt.to_period('M')
+    return temp_df.groupby('month')['rating'].agg(['mean', 'count']).reset_index()
+
+
+class StubZeroShotClassifier:
+    """
+    Mimics the output of transformers' zero-shot-classification pipeline without a model,
+    so the batching / bookkeeping overhead of custom_topic_classification.py can be timed.
+    """
+
+    def __init__(self, seconds_per_item: float = 0.0):
+        self.seconds_per_item = seconds_per_item
+
+    def __call__(self, sequences, candidate_labels, multi_label=False, batch_size=None):
+        single = isinstance(sequences, str)
+        sequences = [sequences] if single else sequences
+        if self.seconds_per_item:
+            time.sleep(self.seconds_per_item * len(sequences))
+        results = []
+        for sequence in sequences:
+            # crc32 rather than hash(): str hashes are salted per process, which would break --compare
+            first = zlib.crc32(sequence.encode("utf-8")) % len(candidate_labels)
+            labels = candidate_labels[first:] + candidate_labels[:first]
+            scores = np.linspace(1.0, 0.1, len(labels))
+            results.append({'sequence': sequence, 'labels': labels, 'scores': (scores / scores.sum()).tolist()})
+        return results[0] if single else results
+
+
+def classify_with_stub(sentences, classifier, batch_size=32):
+    """Stage 1 batching loop from custom_topic_classification.py"""
+    results = []
+    for i in range(0, len(sentences), batch_size):
+        batch = sentences[i:i + batch_size]
+        results.extend(classifier(batch, candidate_labels=MAIN_TOPICS, multi_label=False))
+    return [res['labels'][0] for res in results]
+
+
+def run_llm_benchmark(stage, texts, latency_s, error_rate, concurrency, messy_rate=0.0, model="fake-gpt"):
+    """Classify `texts` through the OpenAI client against a local fake server"""
+    import openai
+
+    with open(PROMPT_PATH, 'r', encoding='utf-8') as file:
+        prompt_template = file.read()
+    schema = ClassificationSchema.from_prompt_file(PROMPT_PATH)
+
+    with FakeLLMServer(latency_s=latency_s, latency_jitter_s=latency_s / 4, error_rate=error_rate,
+                       messy_rate=messy_rate) as server:
+        client = openai.OpenAI(api_key="fake", base_url=server.base_url, max_retries=0)
+
+        def classify(text):
+            retries = 0
+            while True:
+                started = time.perf_counter()
+                try:
+                    response = client.chat.completions.create(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt_template % (text)}],
+                        max_tokens=2048,
+                        temperature=0.1,
+                    )
+                    result = parse_classification(response.choices[0].message.content, schema)
+                except (openai.APIError, ClassificationParseError):
+                    retries += 1
+                    if retries > 5:
+                        return None, time.perf_counter() - started, retries, None
+                    continue
+                return result, time.perf_counter() - started, retries, response.usage
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outputs = list(executor.map(classify, texts))
+
+        for result, latency, retries, usage in outputs:
+            stage.record_llm_call(
+                latency,
+                tokens_in=getattr(usage, 'prompt_tokens', 0),
+                tokens_out=getattr(usage, 'completion_tokens', 0),
+                retries=retries,
+                failed=result is None,
+            )
+        stage.extra['server_requests'] = server.request_count
+        stage.extra['concurrency'] = concurrency
+    return [result for result, *_ in outputs]
+
+
+def run_scale(n_reviews, args):
+    metrics = RunMetrics(f"benchmark_{n_reviews}", output_dir=args.output_dir)
+    metrics.info = {
+        'n_reviews_per_source': n_reviews,
+        'seed': args.seed,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+    print(f"\n=== BENCHMARK: {n_reviews:,} reviews per source ===")
+
+    with metrics.stage("generate", rows_in=2 * n_reviews) as stage:
+        trustpilot_df = generate_trustpilot_reviews(n_reviews, seed=args.seed)
+        appstore_df = generate_appstore_reviews(n_reviews, seed=args.seed + 1)
+        combined_reviews_df = pd.concat([SOURCE_ADAPTERS['appstore'].standardize(appstore_df),
+                                         SOURCE_ADAPTERS['trustpilot'].standardize(trustpilot_df)],
+                                        ignore_index=True)
+        stage.rows_out = len(combined_reviews_df)
+
+    if args.csv_dir:
+        trustpilot_path, appstore_path = write_synthetic_exports(args.csv_dir, n_reviews, seed=args.seed)
+        with metrics.stage("load_csv_raw", rows_in=2 * n_reviews) as stage:
+            raw_dfs = [pd.read_csv(appstore_path), pd.read_csv(trustpilot_path)]
+            stage.extra['memory_mb'] = sum(df.memory_usage(deep=True).sum() for df in raw_dfs) / 1e6
+            stage.rows_out = sum(len(df) for df in raw_dfs)
+        del raw_dfs
+        with metrics.stage("load_csv_adapters", rows_in=2 * n_reviews) as stage:
+            loaded_df = load_combined_reviews({'appstore': appstore_path, 'trustpilot': trustpilot_path})
+            stage.extra['memory_mb'] = loaded_df.memory_usage(deep=True).sum() / 1e6
+            stage.rows_out = len(loaded_df)
+        del loaded_df
+
+    text_data = combined_reviews_df['description']
+    text_data = text_data[text_data != '']
+
+    with metrics.stage("tokenization", rows_in=len(text_data)) as stage:
+        words = text_data.str.lower().str.findall(r'\b\w+\b').explode()
+        stage.rows_out = len(words)
+
+    with metrics.stage("ngram_counting", rows_in=len(words)) as stage:
+        unigram_counts, bigram_counts = count_ngrams(words)
+        stage.rows_out = len(unigram_counts) + len(bigram_counts)
+
+    with metrics.stage("sentence_expansion", rows_in=len(combined_reviews_df)) as stage:
+        expanded_df = expand_sentences(combined_reviews_df)
+        stage.rows_out = len(expanded_df)
+
+    with metrics.stage("summary_statistics", rows_in=len(combined_reviews_df)) as stage:
+        combined_reviews_df.describe(include='all')
+        combined_reviews_df.groupby('source')['rating'].agg(['mean', 'median', 'std', 'count'])
+        stage.rows_out = combined_reviews_df['source'].nunique()
+
+    with metrics.stage("trend_aggregation", rows_in=len(combined_reviews_df)) as stage:
+        monthly_avg = monthly_trends(combined_reviews_df)
+        stage.rows_out = len(monthly_avg)
+
+    sentences = expanded_df['sentence'].head(args.stub_sentences).tolist()
+    with metrics.stage("stub_classification", rows_in=len(sentences)) as stage:
+        labels = classify_with_stub(sentences, StubZeroShotClassifier(args.stub_seconds_per_item))
+        stage.rows_out = len(labels)
+
+    if args.llm_requests:
+        texts = text_data.head(args.llm_requests).tolist()
+        with metrics.stage("llm_classification", rows_in=len(texts)) as stage:
+            results = run_llm_benchmark(stage, texts, args.llm_latency, args.llm_error_rate, args.llm_concurrency,
+                                        messy_rate=args.llm_messy_rate)
+            stage.rows_out = sum(result is not None for result in results)
+
+    metrics.print_summary()
+    path = metrics.save()
+    print(f"📁 Results saved to {path}")
+    return path
+
+
+def compare(old_path, new_path):
+    """Print wall time per stage of two result files side by side"""
+    with open(old_path) as file:
+        old = {stage['name']: stage for stage in json.load(file)['stages']}
+    with open(new_path) as file:
+        new = {stage['name']: stage for stage in json.load(file)['stages']}
+
+    print(f"{'stage':<22}{'old, s':>10}{'new, s':>10}{'speedup':>10}")
+    for name, stage in new.items():
+        if name not in old:
+            print(f"{name:<22}{'-':>10}{stage['wall_time_s']:>10.3f}{'-':>10}")
+            continue
+        old_time, new_time = old[name]['wall_time_s'], stage['wall_time_s']
+        speedup = old_time / new_time if new_time else float('inf')
+        print(f"{name:<22}{old_time:>10.3f}{new_time:>10.3f}{speedup:>9.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the review analysis pipeline on synthetic data")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="number of reviews per source, one run per value")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default=BENCHMARK_DIR)
+    parser.add_argument("--csv-dir", default=None,
+                        help="write synthetic CSV exports here and benchmark loading them")
+    parser.add_argument("--stub-sentences", type=int, default=100_000,
+                        help="max sentences sent through the stub zero-shot classifier")
+    parser.add_argument("--stub-seconds-per-item", type=float, default=0.0,
+                        help="simulated model time per sentence")
+    parser.add_argument("--llm-requests", type=int, default=200, help="0 disables the LLM benchmark")
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="fake server latency, seconds")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--llm-messy-rate", type=float, default=0.0,
+                        help="share of fake answers wrapped in markdown fences")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        for scale in args.scales:
+            run_scale(scale, args)
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Tolerant parsing and validation of LLM classification answers.
+
+The prompt in prompts/message_sentiments_prompt.md asks for a raw JSON object, but
+models regularly wrap it in markdown fences, leave trailing commas, drop fields
+or return near-miss labels ("Billing problem", "Critical"). Re-sending the prompt for those costs a full paid
+completion, so this module repairs what can be repaired and only raises
+`ClassificationParseError` when the answer is truly unusable.
+
+Allowed labels come from the Hierarchy Table inside the prompt, so the schema and
+the prompt never drift apart.
+
+Usage:
+    schema = ClassificationSchema.from_prompt_file("prompts/message_sentiments_prompt.md")
+    result = parse_classification(response.choices[0].message.content, schema)
+
+    client.chat.completions.create(..., response_format=JSON_RESPONSE_FORMAT)
+"""
+
+import ast
+import csv
+import difflib
+import io
+import json
+import re
+
+DEFAULT_PROMPT_PATH = "prompts/message_sentiments_prompt.md"
+HIERARCHY_HEADER = "Main Topic,Sub-Topic,Keywords"
+
+SENTIMENTS = ["positive", "negative", "neutral", "mixed"]
+PRIORITY_LEVELS = ["low", "medium", "high", "critical"]
+CONTENT_FLAGS = ["inappropriate_content", "hate_speech", "spam", "threat", "private_information"]
+
+SENTIMENT_ALIASES = {
+    "pos": "positive", "good": "positive",
+    "neg": "negative", "bad": "negative",
+    "neutral/mixed": "mixed", "both": "mixed", "none": "neutral",
+}
+PRIORITY_ALIASES = {
+    "urgent": "critical", "severe": "critical", "highest": "critical",
+    "moderate": "medium", "normal": "medium", "med": "medium",
+    "minor": "low", "lowest": "low",
+}
+# Labels from older versions of the prompt's example answer, which were not in the Hierarchy Table
+CATEGORY_ALIASES = {"bugs": "App Functionality & User Experience (UX/UI)"}
+SUBCATEGORY_ALIASES = {"app crashes": "App Performance", "crashes": "App Performance", "bugs": "App Performance"}
+
+# Supported by OpenAI and by Gemini's OpenAI-compatible endpoint
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+
+FENCE_PATTERN = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+# `"subcategory": App Crashes",` -> value with a missing opening quote
+MISSING_OPEN_QUOTE_PATTERN = re.compile(r'(:\s*)([A-Za-z][^"\n{}\[\]]*)"(\s*[,}\n])')
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+class ClassificationParseError(ValueError):
+    pass
+
+
+def parse_hierarchy_table(prompt):
+    """Return {category: {subcategory: [keywords]}} from the prompt's Hierarchy Table"""
+    if HIERARCHY_HEADER not in prompt:
+        return {}
+    table = prompt.split(HIERARCHY_HEADER, 1)[1].split("##", 1)[0]
+    hierarchy = {}
+    for row in csv.reader(io.StringIO(table.strip())):
+        if len(row) < 3:
+            continue
+        keywords = [keyword.strip().strip('"') for keyword in row[2].split('",')]
+        hierarchy.setdefault(row[0].strip(), {})[row[1].strip()] = [k for k in keywords if k]
+    return hierarchy
+
+
+class ClassificationSchema:
+    def __init__(self, hierarchy: dict):
+        self.hierarchy = hierarchy
+        self.categories = list(hierarchy)
+        self.subcategory_to_category = {
+            subcategory: category for category, subcategories in hierarchy.items() for subcategory in subcategories
+        }
+
+    @classmethod
+    def from_prompt_file(cls, path: str = DEFAULT_PROMPT_PATH):
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls(parse_hierarchy_table(file.read()))
+
+    def json_schema_response_format(self):
+        """
+        `response_format` for APIs that support strict structured outputs (json_schema);
+        LLMRouter sends it to backends configured with `response_format: json_schema`.
+        """
+        string_list = {"type": "array", "items": {"type": "string"}}
+        properties = {
+            "content_flags": {"type": "array", "items": {"type": "string", "enum": CONTENT_FLAGS}},
+            "sentiment": {"type": "string", "enum": SENTIMENTS},
+            "priority_level": {"type": "string", "enum": PRIORITY_LEVELS},
+            "category": {"type": "string", "enum": self.categories},
+            "subcategory": {"type": "string", "enum": list(self.subcategory_to_category)},
+            "confidence_score": {"type": "number"},
+            "key_points": string_list,
+            "keywords": string_list,
+        }
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "review_classification",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": properties,
+                    "required": list(properties),
+                    "additionalProperties": False,
+                },
+            },
+        }
+
+
+def _find_json_object(text):
+    """Return the first balanced {...} block in text, ignoring braces inside strings"""
+    start = text.find("{")
+    if start == -1:
+        return None
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    end = text.rfind("}")
+    if end > start:
+        # Unbalanced quotes (e.g. a missing opening quote) confuse the scan; take the outermost braces
+        return text[start:end + 1]
+    # Truncated answer: close what is open and let the repairs try
+    return text[start:] + ("\"" if in_string else "") + "}" * depth
+
+
+def extract_json(text):
+    """Pull a JSON object out of a model answer, repairing common formatting slips"""
+    if text is None:
+        raise ClassificationParseError("Empty response")
+    text = text.translate(SMART_QUOTES).strip()
+    fenced = FENCE_PATTERN.search(text)
+    if fenced:
+        text = fenced.group(1)
+    candidate = _find_json_object(text)
+    if candidate is None:
+        raise ClassificationParseError(f"No JSON object in response: {text[:200]!r}")
+
+    attempts = [candidate]
+    repaired = TRAILING_COMMA_PATTERN.sub(r"\1", candidate)
+    attempts.append(repaired)
+    attempts.append(MISSING_OPEN_QUOTE_PATTERN.sub(r'\1"\2"\3', repaired))
+    for attempt in attempts:
+        try:
+            result = json.loads(attempt)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(result, dict):
+            return result
+
+    # Python-style dicts: single quotes, True/False/None
+    try:
+        result = ast.literal_eval(repaired)
+    except (ValueError, SyntaxError):
+        result = None
+    if isinstance(result, dict):
+        return result
+    raise ClassificationParseError(f"Could not repair JSON: {candidate[:200]!r}")
+
+
+def _closest(value, choices, aliases=None, cutoff=0.75):
+    """Map a near-miss label onto one of `choices`, or None"""
+    if value is None:
+        return None
+    cleaned = re.sub(r"\s+", " ", str(value)).strip().strip(".").lower()
+    if not cleaned:
+        return None
+    by_lower = {choice.lower(): choice for choice in choices}
+    if cleaned in by_lower:
+        return by_lower[cleaned]
+    if aliases and cleaned in aliases:
+        return by_lower.get(aliases[cleaned].lower())
+    match = difflib.get_close_matches(cleaned, list(by_lower), n=1, cutoff=cutoff)
+    return by_lower[match[0]] if match else None
+
+
+def _as_list(value):
+    if value is None or value == "":
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value if item not in (None, "")]
+    return [str(value)]
+
+
+def validate_classification(result: dict, schema: ClassificationSchema):
+    """
+    Normalize a parsed answer against the schema.
+    Raises ClassificationParseError if sentiment or the category pair cannot be resolved.
+    """
+    sentiment = _closest(result.get("sentiment"), SENTIMENTS, SENTIMENT_ALIASES)
+    if sentiment is None:
+        raise ClassificationParseError(f"Unknown sentiment: {result.get('sentiment')!r}")
+
+    subcategory = _closest(result.get("subcategory"), list(schema.subcategory_to_category), SUBCATEGORY_ALIASES)
+    category = _closest(result.get("category"), schema.categories, CATEGORY_ALIASES)
+    if subcategory is not None and category != schema.subcategory_to_category[subcategory]:
+        # The subcategory is more specific, so it decides the category
+        category = schema.subcategory_to_category[subcategory]
+    if category is None:
+        raise ClassificationParseError(
+            f"Unknown category/subcategory: {result.get('category')!r} / {result.get('subcategory')!r}")
+    if subcategory is None:
+        subcategory = _closest(result.get("subcategory"), list(schema.hierarchy[category]), cutoff=0.5)
+
+    confidence = result.get("confidence_score")
+    try:
+        confidence = min(max(float(confidence), 0.0), 1.0) if confidence is not None else None
+    except (TypeError, ValueError):
+        confidence = None
+
+    return {
+        "content_flags": [flag for flag in (_closest(f, CONTENT_FLAGS) for f in _as_list(result.get("content_flags")))
+                          if flag],
+        "sentiment": sentiment,
+        "priority_level": _closest(result.get("priority_level"), PRIORITY_LEVELS, PRIORITY_ALIASES),
+        "category": category,
+        "subcategory": subcategory,
+        "confidence_score": confidence,
+        "key_points": _as_list(result.get("key_points")),
+        "keywords": _as_list(result.get("keywords")),
+    }
+
+
+def parse_classification(text, schema: ClassificationSchema):
+    """extract_json() + validate_classification()"""
+    return validate_classification(extract_json(text), schema)
@@ -5,16 +5,28 @@ Custom Topic & Sub-Topic Classification using Zero-Shot Learning (Optimized & Fa
 This script classifies review sentences into a predefined hierarchy. This version
 uses a LIGHTWEIGHT and FAST model ('Moritz/distilbert-base-uncased-mnli') for
 significantly faster processing time.
+
+Usage:
+    python custom_topic_classification.py [input.csv] [output.csv]
+
+For large inputs, `work_queue.py` runs the same two-stage classification sharded
+across worker processes / machines.
 """
 
 # =============================================================================
 # Крок 1: Імпорт бібліотек та визначення ієрархії топіків
 # =============================================================================
+import sys
+
 import pandas as pd
 from transformers import pipeline
 import torch
 from tqdm import tqdm
 
+from stage_metrics import RunMetrics
+
+metrics = RunMetrics("custom_topic_classification")
+
 print("="*60)
 print("Ініціалізація ШВИДКОГО скрипту класифікації...")
 print("="*60)
@@ -54,11 +66,15 @@ print("✅ Ієрархію топіків успішно завантажено
 print("\n--- Крок 2/4: Завантаження даних та Zero-Shot моделі ---")
 
 # Завантажуємо датасет
-file_path = '/Users/user/PycharmProjects/genesis-analytics-game/llm-messages-analysis/df/expanded_df.csv'
+file_path = sys.argv[1] if len(sys.argv) > 1 else \
+    '/Users/user/PycharmProjects/genesis-analytics-game/llm-messages-analysis/df/expanded_df.csv'
 try:
-    df = pd.read_csv(file_path)
-    df.dropna(subset=['sentence'], inplace=True)
-    df['sentence'] = df['sentence'].astype(str)
+    with metrics.stage("load_data") as stage:
+        df = pd.read_csv(file_path)
+        stage.rows_in = len(df)
+        df.dropna(subset=['sentence'], inplace=True)
+        df['sentence'] = df['sentence'].astype(str)
+        stage.rows_out = len(df)
     print(f"✅ Датасет успішно завантажено. Кількість речень: {len(df):,}")
 except FileNotFoundError:
     print(f"❌ ПОМИЛКА: Файл не знайдено: {file_path}")
@@ -95,20 +111,22 @@ BATCH_SIZE = 32 # Можна збільшити батч для меншої м
 print(f"⏳ Етап 1: Класифікація за основними топіками... (батчі по {BATCH_SIZE})")
 main_topic_results_list = []
 
-# Ручна ітерація по батчах з tqdm для візуалізації прогресу
-for i in tqdm(range(0, len(sentences_to_classify), BATCH_SIZE), desc="Основні топіки"):
-    batch = sentences_to_classify[i:i + BATCH_SIZE]
-    if not batch: # Пропускаємо пустий батч в кінці, якщо є
-        continue
-    results = classifier(
-        batch,
-        candidate_labels=MAIN_TOPICS,
-        multi_label=False
-    )
-    # classifier повертає список результатів для батча, тому розширюємо список
-    main_topic_results_list.extend(results)
-
-df['Main Topic'] = [res['labels'][0] for res in main_topic_results_list]
+with metrics.stage("main_topics", rows_in=len(sentences_to_classify)) as stage:
+    # Ручна ітерація по батчах з tqdm для візуалізації прогресу
+    for i in tqdm(range(0, len(sentences_to_classify), BATCH_SIZE), desc="Основні топіки"):
+        batch = sentences_to_classify[i:i + BATCH_SIZE]
+        if not batch: # Пропускаємо пустий батч в кінці, якщо є
+            continue
+        results = classifier(
+            batch,
+            candidate_labels=MAIN_TOPICS,
+            multi_label=False
+        )
+        # classifier повертає список результатів для батча, тому розширюємо список
+        main_topic_results_list.extend(results)
+
+    df['Main Topic'] = [res['labels'][0] for res in main_topic_results_list]
+    stage.rows_out = len(main_topic_results_list)
 print("✅ Етап 1: Основні топіки класифіковано.")
 
 
@@ -116,31 +134,33 @@ print("✅ Етап 1: Основні топіки класифіковано.")
 print("\n⏳ Етап 2: Класифікація за саб-топіками...")
 df['Sub-Topic'] = "N/A" # Створюємо колонку зі значенням за замовчуванням
 
-# Групуємо речення за знайденим основним топіком
-grouped_topics = df.groupby('Main Topic')
-# Використовуємо tqdm для візуалізації прогресу по групах
-for main_topic, group_df in tqdm(grouped_topics, total=len(grouped_topics), desc="Обробка груп саб-топіків"):
-    sub_topic_candidates = TOPIC_HIERARCHY.get(main_topic)
+with metrics.stage("sub_topics", rows_in=len(df)) as stage:
+    # Групуємо речення за знайденим основним топіком
+    grouped_topics = df.groupby('Main Topic')
+    # Використовуємо tqdm для візуалізації прогресу по групах
+    for main_topic, group_df in tqdm(grouped_topics, total=len(grouped_topics), desc="Обробка груп саб-топіків"):
+        sub_topic_candidates = TOPIC_HIERARCHY.get(main_topic)
 
-    # Перевіряємо, чи є для цієї групи саб-топіки та речення
-    if not sub_topic_candidates or group_df.empty:
-        continue
+        # Перевіряємо, чи є для цієї групи саб-топіки та речення
+        if not sub_topic_candidates or group_df.empty:
+            continue
 
-    print(f"  -> Обробка групи '{main_topic}' ({len(group_df)} речень)...")
+        print(f"  -> Обробка групи '{main_topic}' ({len(group_df)} речень)...")
     
-    group_sentences = group_df['sentence'].tolist()
+        group_sentences = group_df['sentence'].tolist()
     
-    # Класифікуємо тільки речення поточної групи
-    sub_topic_results = classifier(
-        group_sentences,
-        candidate_labels=sub_topic_candidates,
-        batch_size=BATCH_SIZE,
-        multi_label=False
-    )
+        # Класифікуємо тільки речення поточної групи
+        sub_topic_results = classifier(
+            group_sentences,
+            candidate_labels=sub_topic_candidates,
+            batch_size=BATCH_SIZE,
+            multi_label=False
+        )
     
-    # Оновлюємо значення 'Sub-Topic' тільки для цієї групи
-    predicted_sub_topics = [res['labels'][0] for res in sub_topic_results]
-    df.loc[group_df.index, 'Sub-Topic'] = predicted_sub_topics
+        # Оновлюємо значення 'Sub-Topic' тільки для цієї групи
+        predicted_sub_topics = [res['labels'][0] for res in sub_topic_results]
+        df.loc[group_df.index, 'Sub-Topic'] = predicted_sub_topics
+    stage.rows_out = int((df['Sub-Topic'] != "N/A").sum())
 
 print("\n✅ Класифікацію успішно завершено!")
 
@@ -151,8 +171,10 @@ print("\n✅ Класифікацію успішно завершено!")
 print("\n--- Крок 4/4: Збереження та перегляд результатів ---")
 
 # Зберігаємо результат у новий CSV файл
-output_file_path = '/Users/user/PycharmProjects/genesis-analytics-game/llm-messages-analysis/df/expanded_df_with_custom_topics_fast_model.csv'
-df.to_csv(output_file_path, index=False)
+output_file_path = sys.argv[2] if len(sys.argv) > 2 else \
+    '/Users/user/PycharmProjects/genesis-analytics-game/llm-messages-analysis/df/expanded_df_with_custom_topics_fast_model.csv'
+with metrics.stage("save_results", rows_in=len(df)):
+    df.to_csv(output_file_path, index=False)
 
 print(f"✅ Результати збережено у файл: {output_file_path}")
 
@@ -162,6 +184,9 @@ print(df[['sentence', 'Main Topic', 'Sub-Topic']].head(10))
 print("\nРозподіл за основними топіками:")
 print(df['Main Topic'].value_counts())
 
+metrics.print_summary()
+print(f"📁 Метрики етапів збережено у файл: {metrics.save()}")
+
 print("\n" + "="*60)
 print("✅ Скрипт завершив роботу!")
 print("="*60) 
\ No newline at end of file
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Local fake OpenAI-compatible server for benchmarks and tests.
+
+Serves `POST /v1/chat/completions` with a classification JSON in the format asked for
+by prompts/message_sentiments_prompt.md. The category/subcategory is picked from the
+Hierarchy Table found in the prompt itself by keyword overlap with the review, so
+no network access or API key is needed. Latency, error rate and the share of
+"messy" (markdown-fenced) answers are configurable.
+
+Usage:
+    with FakeLLMServer(latency_s=0.2, error_rate=0.05) as server:
+        client = openai.OpenAI(api_key="fake", base_url=server.base_url)
+        ...
+
+    python fake_llm_server.py --port 8009 --latency 0.3 --error-rate 0.02
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from classification_schema import parse_hierarchy_table
+
+REVIEW_PATTERN = re.compile(r"```\{(.*)\}```", re.DOTALL)
+WORD_PATTERN = re.compile(r"\b\w+\b")
+
+NEGATIVE_WORDS = {"crash", "crashes", "scam", "refund", "cancel", "charged", "useless", "no", "not",
+                  "never", "robotic", "monotonous", "terrible", "poor", "misleading", "slow"}
+POSITIVE_WORDS = {"great", "love", "easy", "helpful", "amazing", "insightful", "useful", "learn",
+                  "well", "clear", "wide"}
+
+
+def hierarchy_keyword_rows(prompt):
+    """Return [(category, subcategory, keyword words)] from the prompt's Hierarchy Table"""
+    return [
+        (category, subcategory, set(WORD_PATTERN.findall(" ".join(keywords).lower())))
+        for category, subcategories in parse_hierarchy_table(prompt).items()
+        for subcategory, keywords in subcategories.items()
+    ]
+
+
+def fake_classification(review, hierarchy):
+    """Cheap deterministic stand-in for the model's answer"""
+    words = set(WORD_PATTERN.findall(review.lower()))
+    if hierarchy:
+        category, subcategory, _ = max(hierarchy, key=lambda row: len(words & row[2]))
+    else:
+        category, subcategory = "", ""
+    negative = len(words & NEGATIVE_WORDS)
+    positive = len(words & POSITIVE_WORDS)
+    if negative and positive:
+        sentiment = "mixed"
+    elif negative:
+        sentiment = "negative"
+    elif positive:
+        sentiment = "positive"
+    else:
+        sentiment = "neutral"
+    return {
+        "content_flags": [],
+        "sentiment": sentiment,
+        "priority_level": "high" if negative > 1 else "medium" if negative else "low",
+        "category": category,
+        "subcategory": subcategory,
+        "confidence_score": 0.8,
+        "key_points": [],
+        "keywords": sorted(words & (NEGATIVE_WORDS | POSITIVE_WORDS)),
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeLLM/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": self.server.model, "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        config = self.server.config
+        rng = self.server.next_rng()
+
+        time.sleep(max(0.0, config['latency_s'] + rng.uniform(-1, 1) * config['latency_jitter_s']))
+        self.server.count_request()
+
+        if rng.random() < config['error_rate']:
+            status = rng.choice([429, 500, 503])
+            self._send_json(status, {"error": {"message": f"fake error {status}", "type": "server_error"}})
+            return
+
+        prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+        match = REVIEW_PATTERN.search(prompt)
+        review = match.group(1) if match else prompt
+        content = json.dumps(fake_classification(review, self.server.hierarchy_for(prompt)), indent=2)
+        if rng.random() < config['messy_rate']:
+            content = f"```json\n{content}\n```"
+
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        self._send_json(200, {
+            "id": f"chatcmpl-fake-{self.server.request_count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", self.server.model),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config, model, seed):
+        super().__init__(address, _Handler)
+        self.config = config
+        self.model = model
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._seed = seed
+        self._hierarchy_cache = {}
+
+    def next_rng(self):
+        with self._lock:
+            self._seed += 1
+            return random.Random(self._seed)
+
+    def count_request(self):
+        with self._lock:
+            self.request_count += 1
+
+    def hierarchy_for(self, prompt):
+        # The prompt template is the same for every request, so parse its table once
+        key = hash(prompt.split("## Task", 1)[0])
+        if key not in self._hierarchy_cache:
+            self._hierarchy_cache[key] = hierarchy_keyword_rows(prompt)
+        return self._hierarchy_cache[key]
+
+
+class FakeLLMServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_s: float = 0.0,
+                 latency_jitter_s: float = 0.0, error_rate: float = 0.0, messy_rate: float = 0.0,
+                 model: str = "fake-gpt", seed: int = 0):
+        self.config = {
+            'latency_s': latency_s,
+            'latency_jitter_s': latency_jitter_s,
+            'error_rate': error_rate,
+            'messy_rate': messy_rate,
+        }
+        self._server = _Server((host, port), self.config, model, seed)
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def request_count(self):
+        return self._server.request_count
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8009)
+    parser.add_argument("--latency", type=float, default=0.2, help="mean response latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="+/- latency jitter, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--messy-rate", type=float, default=0.0, help="share of markdown-fenced answers")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.messy_rate)
+    print(f"Fake LLM server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-provider router for review classification.
+
+Spreads chat completion traffic over several OpenAI-compatible backends (OpenAI,
+Gemini's OpenAI endpoint, local servers, ...). Every backend has its own pooled
+HTTP client, concurrency limit and weight. A backend that keeps failing is taken
+out of rotation for a cool-down period and requests fail over to the others.
+Answers are parsed and validated against the classification schema of
+prompts/message_sentiments_prompt.md (see classification_schema.py), and
+per-backend throughput is tracked.
+
+Config (YAML, read with YamlParser):
+    backends:
+      - name: openai
+        model: gpt-4.1
+        api_key_file: creds/openai.yml
+        api_key_field: OPENAI_API_KEY
+        weight: 3
+        max_concurrency: 16
+        response_format: json_schema
+      - name: gemini
+        model: gemini-2.0-flash
+        base_url: https://generativelanguage.googleapis.com/v1beta/openai/
+        api_key_file: creds/gemini.yml
+        api_key_field: GEMINI_KEY
+        weight: 1
+        max_concurrency: 8
+        response_format: json_object
+
+`response_format` enables the API's JSON mode per backend: json_object (JSON mode),
+json_schema (strict structured output from the Hierarchy Table) or unset for servers
+that support neither; answers are parsed tolerantly either way. `weight: 0` takes a
+backend out of rotation without removing it from the config.
+
+Usage:
+    router = LLMRouter.from_config("creds/llm_backends.yml")
+    results = router.classify_many([MARKDOWN_PROMPT % (text) for text in df.content])
+    router.print_report()
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import openai
+import numpy as np
+
+from classification_schema import (ClassificationParseError, ClassificationSchema, JSON_RESPONSE_FORMAT,
+                                   parse_classification)
+from yaml_helper import YamlParser
+
+DEFAULT_REQUEST_PARAMS = {
+    "max_tokens": 2048,
+    "n": 1,
+    "temperature": 0.1,
+}
+RESPONSE_FORMATS = (None, "json_object", "json_schema")
+
+
+class NoHealthyBackendError(RuntimeError):
+    pass
+
+
+def is_backend_error(error):
+    """
+    True for errors that say something about the backend (429, 5xx, timeouts, connection
+    errors) and count towards its health; other 4xx errors are caused by the request itself.
+    """
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 429) or error.status_code >= 500
+    return isinstance(error, (openai.APIConnectionError, httpx.HTTPError))
+
+
+class Backend:
+    def __init__(self, name: str, model: str, api_key: str, base_url: str = None, weight: float = 1.0,
+                 max_concurrency: int = 8, timeout_s: float = 60.0, failure_threshold: int = 3,
+                 cooldown_s: float = 30.0, response_format: str = None):
+        if response_format not in RESPONSE_FORMATS:
+            raise ValueError(f"Backend '{name}': response_format must be one of {RESPONSE_FORMATS}")
+        if weight < 0:
+            raise ValueError(f"Backend '{name}': weight must be >= 0 (0 disables the backend)")
+        self.name = name
+        self.response_format = response_format
+        self.model = model
+        self.weight = float(weight)
+        self.max_concurrency = int(max_concurrency)
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+
+        # One connection pool per backend, sized to its concurrency limit
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=self.max_concurrency,
+                                max_keepalive_connections=self.max_concurrency),
+            timeout=timeout_s,
+        )
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url, http_client=self.http_client,
+                                    max_retries=0)
+        self.slots = threading.BoundedSemaphore(self.max_concurrency)
+
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.latencies = []
+        self.first_request_at = None
+        self.last_response_at = None
+
+    def is_healthy(self, now=None):
+        return (now or time.monotonic()) >= self.unhealthy_until
+
+    def try_acquire(self):
+        if not self.slots.acquire(blocking=False):
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self.slots.release()
+
+    def record_success(self, latency_s, usage):
+        with self._lock:
+            now = time.monotonic()
+            self.first_request_at = self.first_request_at or now - latency_s
+            self.last_response_at = now
+            self.requests += 1
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.latencies.append(latency_s)
+            self.tokens_in += getattr(usage, 'prompt_tokens', 0) or 0
+            self.tokens_out += getattr(usage, 'completion_tokens', 0) or 0
+
+    def record_failure(self, latency_s, counts_for_health=True):
+        with self._lock:
+            now = time.monotonic()
+            self.first_request_at = self.first_request_at or now - latency_s
+            self.last_response_at = now
+            self.requests += 1
+            self.failures += 1
+            if not counts_for_health:
+                return
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                # Back off exponentially while the backend keeps failing
+                extra = self.consecutive_failures - self.failure_threshold
+                self.unhealthy_until = now + self.cooldown_s * (2 ** min(extra, 5))
+
+    def stats(self):
+        with self._lock:
+            elapsed = (self.last_response_at - self.first_request_at) if self.requests else 0.0
+            latencies = np.asarray(self.latencies) if self.latencies else None
+            return {
+                'model': self.model,
+                'weight': self.weight,
+                'max_concurrency': self.max_concurrency,
+                'requests': self.requests,
+                'successes': self.successes,
+                'failures': self.failures,
+                'tokens_in': self.tokens_in,
+                'tokens_out': self.tokens_out,
+                'requests_per_s': self.successes / elapsed if elapsed else None,
+                'latency_p50_s': float(np.percentile(latencies, 50)) if latencies is not None else None,
+                'latency_p90_s': float(np.percentile(latencies, 90)) if latencies is not None else None,
+                'healthy': self.is_healthy(),
+            }
+
+    def close(self):
+        self.http_client.close()
+
+
+class LLMRouter:
+    def __init__(self, backends, schema: ClassificationSchema = None, max_attempts: int = None,
+                 parse_retries: int = 1, wait_s: float = 0.01, max_cooldown_wait_s: float = 300.0,
+                 seed: int = None):
+        self.backends = list(backends)
+        # weight: 0 keeps a backend in the config and report but out of rotation
+        self.active_backends = [backend for backend in self.backends if backend.weight > 0]
+        if not self.active_backends:
+            raise ValueError("LLMRouter needs at least one backend with weight > 0")
+        self.schema = schema or ClassificationSchema.from_prompt_file()
+        self.parse_retries = parse_retries
+        self.parse_failures = 0
+        self.max_attempts = max_attempts or 2 * len(self.active_backends) + 1
+        self.wait_s = wait_s
+        self.max_cooldown_wait_s = max_cooldown_wait_s
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._response_formats = {
+            "json_object": JSON_RESPONSE_FORMAT,
+            "json_schema": self.schema.json_schema_response_format(),
+        }
+
+    @classmethod
+    def from_config(cls, path: str, **kwargs):
+        """Build backends from a YAML config, see module docstring"""
+        config = YamlParser(path).read()
+        backends = []
+        for entry in config['backends']:
+            entry = dict(entry)
+            if 'api_key' not in entry:
+                key_file = entry.pop('api_key_file')
+                key_field = entry.pop('api_key_field')
+                entry['api_key'] = YamlParser(key_file).read()[key_field]
+            backends.append(Backend(**entry))
+        return cls(backends, **kwargs)
+
+    @property
+    def total_concurrency(self):
+        return sum(backend.max_concurrency for backend in self.active_backends)
+
+    def _acquire_backend(self, exclude):
+        """
+        Pick a healthy backend with a free slot, weighted; blocks until one is available.
+        When every backend is cooling down, waits for the first one to come back,
+        up to max_cooldown_wait_s.
+        """
+        deadline = time.monotonic() + self.max_cooldown_wait_s
+        while True:
+            now = time.monotonic()
+            healthy = [b for b in self.active_backends if b.is_healthy(now)]
+            if not healthy:
+                recovers_at = min(b.unhealthy_until for b in self.active_backends)
+                if recovers_at > deadline:
+                    raise NoHealthyBackendError(
+                        f"All backends are in cool-down for another {recovers_at - now:.0f}s")
+                time.sleep(recovers_at - now)
+                continue
+            candidates = [b for b in healthy if b.name not in exclude] or healthy
+            # Prefer backends with spare capacity relative to their weight
+            with self._lock:
+                order = sorted(candidates, key=lambda b: self._random.random() ** (1.0 / b.weight), reverse=True)
+            for backend in order:
+                if backend.try_acquire():
+                    return backend
+            time.sleep(self.wait_s)
+
+    def _backend_params(self, backend):
+        """Request params a backend supports on top of the defaults"""
+        if backend.response_format is None:
+            return {}
+        return {"response_format": self._response_formats[backend.response_format]}
+
+    def complete(self, messages, **params):
+        """
+        Send one chat completion with failover.
+        Returns (content, backend name, raw response).
+        """
+        tried = set()
+        last_error = None
+        for _ in range(self.max_attempts):
+            backend = self._acquire_backend(tried)
+            request_params = {**DEFAULT_REQUEST_PARAMS, **self._backend_params(backend), **params}
+            started = time.perf_counter()
+            try:
+                response = backend.client.chat.completions.create(
+                    model=backend.model, messages=messages, **request_params)
+                content = response.choices[0].message.content
+            except (openai.APIError, httpx.HTTPError) as e:
+                if not is_backend_error(e):
+                    # A bad request fails the same way everywhere; don't retry it or blame the backend
+                    backend.record_failure(time.perf_counter() - started, counts_for_health=False)
+                    raise
+                backend.record_failure(time.perf_counter() - started)
+                tried.add(backend.name)
+                last_error = e
+                continue
+            finally:
+                backend.release()
+            backend.record_success(time.perf_counter() - started, response.usage)
+            return content, backend.name, response
+        raise last_error
+
+    def classify(self, prompt, **params):
+        """
+        Classify one prompt; the result carries the backend that answered in '_backend'.
+        Answers are repaired where possible, only unusable ones are re-requested.
+        """
+        for attempt in range(self.parse_retries + 1):
+            content, backend_name, _ = self.complete([{"role": "user", "content": prompt}], **params)
+            try:
+                result = parse_classification(content, self.schema)
+            except ClassificationParseError:
+                with self._lock:
+                    self.parse_failures += 1
+                if attempt == self.parse_retries:
+                    raise
+                continue
+            result['_backend'] = backend_name
+            return result
+
+    def classify_many(self, prompts, max_workers: int = None, **params):
+        """Classify prompts concurrently, keeping input order; failures become None"""
+        def safe_classify(prompt):
+            try:
+                return self.classify(prompt, **params)
+            except (openai.APIError, httpx.HTTPError, NoHealthyBackendError, ClassificationParseError) as e:
+                print(f"An error occurred: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.total_concurrency) as executor:
+            return list(executor.map(safe_classify, prompts))
+
+    def stats(self):
+        return {backend.name: backend.stats() for backend in self.backends}
+
+    def print_report(self):
+        print("\n=== LLM ROUTER: PER-BACKEND THROUGHPUT ===")
+        for name, stats in self.stats().items():
+            rate = f"{stats['requests_per_s']:.2f} req/s" if stats['requests_per_s'] else "n/a"
+            p50 = f"{stats['latency_p50_s']:.3f}s" if stats['latency_p50_s'] is not None else "n/a"
+            print(f"  {name}: {stats['successes']}/{stats['requests']} ok, {rate}, p50 {p50}, "
+                  f"{stats['tokens_in']:,} tokens in / {stats['tokens_out']:,} out"
+                  f"{'' if stats['healthy'] else ' (cooling down)'}")
+        print(f"  unusable answers: {self.parse_failures}")
+
+    def close(self):
+        for backend in self.backends:
+            backend.close()
+
+
+if __name__ == "__main__":
+    # Demo against two local stub servers: a fast one and a slow, flaky one
+    from fake_llm_server import FakeLLMServer
+
+    with open("prompts/message_sentiments_prompt.md", 'r', encoding='utf-8') as file:
+        prompt_template = file.read()
+    reviews = ["The app constantly crashes.", "I can't get a refund.", "Robotic voice, human readers would be better."]
+    prompts = [prompt_template % (reviews[i % len(reviews)]) for i in range(300)]
+
+    with FakeLLMServer(latency_s=0.05) as fast, FakeLLMServer(latency_s=0.2, error_rate=0.2) as flaky:
+        router = LLMRouter([
+            Backend("fast", "fake-gpt", "fake", base_url=fast.base_url, weight=2, max_concurrency=8),
+            Backend("flaky", "fake-gpt", "fake", base_url=flaky.base_url, weight=1, max_concurrency=8,
+                    cooldown_s=1.0),
+        ])
+        started = time.perf_counter()
+        results = router.classify_many(prompts)
+        print(f"Classified {sum(r is not None for r in results)}/{len(prompts)} prompts "
+              f"in {time.perf_counter() - started:.2f}s")
+        router.print_report()
+        router.close()
@@ -29,6 +29,11 @@ import sys
 import re
 from collections import Counter
 
+from review_sources import read_source
+from stage_metrics import RunMetrics
+
+metrics = RunMetrics("review_analysis")
+
 # Suppress warnings
 warnings.filterwarnings('ignore')
 
@@ -58,7 +63,9 @@ if not os.path.exists(trustpilot_file):
 
 # Load Trustpilot reviews
 try:
-    trustpilot_df = pd.read_csv(trustpilot_file)
+    with metrics.stage("load_trustpilot") as stage:
+        trustpilot_df = read_source('trustpilot', trustpilot_file)
+        stage.rows_out = len(trustpilot_df)
     print("✅ Trustpilot data loaded successfully!")
 except Exception as e:
     print(f"Error loading Trustpilot data: {e}")
@@ -91,7 +98,9 @@ if not os.path.exists(appstore_file):
 
 # Load App Store reviews
 try:
-    appstore_df = pd.read_csv(appstore_file)
+    with metrics.stage("load_appstore") as stage:
+        appstore_df = read_source('appstore', appstore_file)
+        stage.rows_out = len(appstore_df)
     print("✅ App Store data loaded successfully!")
 except Exception as e:
     print(f"Error loading App Store data: {e}")
@@ -116,16 +125,6 @@ print("\n" + "=" * 60)
 print("CELL 4: Data Cleaning and Preprocessing")
 print("=" * 60)
 
-def clean_dates(df, date_column):
-    """Convert date column to datetime format"""
-    try:
-        df[date_column] = pd.to_datetime(df[date_column], errors='coerce')
-        print(f"✅ Converted {date_column} to datetime")
-        return df
-    except Exception as e:
-        print(f"❌ Could not convert {date_column} to datetime: {e}")
-        return df
-
 def extract_rating(rating_text):
     """Extract numeric rating from text"""
     if pd.isna(rating_text):
@@ -139,51 +138,15 @@ def extract_rating(rating_text):
         pass
     return None
 
-def find_rating_column(df, dataset_name):
-    """Find rating column in dataset"""
-    rating_columns = ['rating', 'score', 'stars', 'review_rating', 'user_rating']
-    for col in rating_columns:
-        if col in df.columns:
-            print(f"✅ Found rating column '{col}' in {dataset_name}")
-            return col
-    print(f"❌ No rating column found in {dataset_name}")
-    return None
-
-def find_date_column(df, dataset_name):
-    """Find date column in dataset"""
-    date_columns = ['date', 'created_at', 'timestamp', 'review_date', 'submitted_at', 'published_date']
-    for col in date_columns:
-        if col in df.columns:
-            print(f"✅ Found date column '{col}' in {dataset_name}")
-            return col
-    print(f"❌ No date column found in {dataset_name}")
-    return None
-
-def find_text_column(df, dataset_name):
-    """Find text column in dataset"""
-    text_columns = ['review', 'text', 'comment', 'content', 'message', 'review_text', 'body']
-    for col in text_columns:
-        if col in df.columns:
-            print(f"✅ Found text column '{col}' in {dataset_name}")
-            return col
-    print(f"❌ No text column found in {dataset_name}")
-    return None
+# Both sources are loaded through review_sources adapters, so the columns are
+# already standardized and dates are parsed with the declared export format
+trustpilot_rating_col = 'rating'
+trustpilot_date_col = 'date_comment'
+trustpilot_text_col = 'description'
 
-# Find columns in both datasets
-print("🔍 Identifying columns in datasets...")
-trustpilot_rating_col = find_rating_column(trustpilot_df, 'Trustpilot')
-trustpilot_date_col = find_date_column(trustpilot_df, 'Trustpilot')
-trustpilot_text_col = find_text_column(trustpilot_df, 'Trustpilot')
-
-appstore_rating_col = find_rating_column(appstore_df, 'App Store')
-appstore_date_col = find_date_column(appstore_df, 'App Store')
-appstore_text_col = find_text_column(appstore_df, 'App Store')
-
-# Clean dates if found
-if trustpilot_date_col:
-    trustpilot_df = clean_dates(trustpilot_df, trustpilot_date_col)
-if appstore_date_col:
-    appstore_df = clean_dates(appstore_df, appstore_date_col)
+appstore_rating_col = 'rating'
+appstore_date_col = 'date_comment'
+appstore_text_col = 'description'
 
 print("✅ Data cleaning completed!")
 
@@ -332,6 +295,7 @@ def analyze_text_column(df, text_column, dataset_name):
     
     # Remove null values
     text_data = df[text_column].dropna()
+    text_data = text_data[text_data.str.strip() != '']
     print(f"Number of reviews with text: {len(text_data)}")
     
     if len(text_data) > 0:
@@ -382,8 +346,10 @@ def analyze_text_column(df, text_column, dataset_name):
             print(f"  - {w1} {w2}: {count:,}")
 
 # Analyze text columns
-analyze_text_column(trustpilot_df, trustpilot_text_col, 'Trustpilot')
-analyze_text_column(appstore_df, appstore_text_col, 'App Store')
+with metrics.stage("text_analysis_trustpilot", rows_in=len(trustpilot_df)):
+    analyze_text_column(trustpilot_df, trustpilot_text_col, 'Trustpilot')
+with metrics.stage("text_analysis_appstore", rows_in=len(appstore_df)):
+    analyze_text_column(appstore_df, appstore_text_col, 'App Store')
 
 # =============================================================================
 # CELL 8: Time-based Analysis
@@ -404,7 +370,7 @@ def analyze_time_trends(df, date_column, rating_column, dataset_name):
     
     # Create a copy and convert date
     temp_df = df[[date_column, rating_column]].copy()
-    temp_df[date_column] = pd.to_datetime(temp_df[date_column], errors='coerce')
+    temp_df[date_column] = pd.to_datetime(temp_df[date_column], errors='coerce', utc=True).dt.tz_localize(None)
     temp_df = temp_df.dropna()
     
     if len(temp_df) == 0:
@@ -442,10 +408,12 @@ def analyze_time_trends(df, date_column, rating_column, dataset_name):
 
 # Analyze time trends for both datasets
 if trustpilot_date_col and trustpilot_rating_col:
-    analyze_time_trends(trustpilot_df, trustpilot_date_col, trustpilot_rating_col, 'Trustpilot')
+    with metrics.stage("time_trends_trustpilot", rows_in=len(trustpilot_df)):
+        analyze_time_trends(trustpilot_df, trustpilot_date_col, trustpilot_rating_col, 'Trustpilot')
 
 if appstore_date_col and appstore_rating_col:
-    analyze_time_trends(appstore_df, appstore_date_col, appstore_rating_col, 'App Store')
+    with metrics.stage("time_trends_appstore", rows_in=len(appstore_df)):
+        analyze_time_trends(appstore_df, appstore_date_col, appstore_rating_col, 'App Store')
 
 # =============================================================================
 # CELL 9: Key Insights and Summary
@@ -511,6 +479,9 @@ if appstore_date_col and appstore_rating_col:
 if appstore_text_col:
     print(f"   • app_store_common_words.png")
 
+metrics.print_summary()
+print(f"   • {metrics.save()}")
+
 print("\n" + "=" * 60)
 print("ANALYSIS COMPLETE!")
 print("=" * 60)
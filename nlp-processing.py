@@ -15,6 +15,10 @@ import pandas as pd
 from bertopic import BERTopic
 import plotly.io as pio
 
+from stage_metrics import RunMetrics
+
+metrics = RunMetrics("nlp_processing")
+
 print("="*60)
 print("Ініціалізація скрипту NLP-обробки...")
 print("="*60)
@@ -29,7 +33,9 @@ print("\n--- Крок 2/5: Завантаження даних та підгот
 file_path = '/Users/user/PycharmProjects/genesis-analytics-game/llm-messages-analysis/df/expanded_df.csv'
 
 try:
-    df = pd.read_csv(file_path)
+    with metrics.stage("load_data") as stage:
+        df = pd.read_csv(file_path)
+        stage.rows_out = len(df)
     print(f"✅ Датасет успішно завантажено з '{file_path}'.")
     print(f"   Кількість речень для аналізу: {len(df):,}")
 except FileNotFoundError:
@@ -68,7 +74,9 @@ print("⏳ Це може зайняти тривалий час, будь лас
 topic_model = BERTopic(language="english", calculate_probabilities=True, verbose=True)
 
 # Навчаємо модель на наших реченнях
-topics, probabilities = topic_model.fit_transform(sentences_to_process)
+with metrics.stage("bertopic_fit_transform", rows_in=len(sentences_to_process)) as stage:
+    topics, probabilities = topic_model.fit_transform(sentences_to_process)
+    stage.rows_out = len(topics)
 
 print("✅ Модель успішно навчена!")
 
@@ -91,7 +99,8 @@ df_to_process['topic_name'] = df_to_process['topic_id'].map(topic_id_to_name)
 
 # Зберігаємо результат у новий CSV файл
 output_file_path = '/Users/user/PycharmProjects/genesis-analytics-game/llm-messages-analysis/df/expanded_df_with_topics.csv'
-df_to_process.to_csv(output_file_path, index=False)
+with metrics.stage("save_results", rows_in=len(df_to_process)):
+    df_to_process.to_csv(output_file_path, index=False)
 
 print(f"✅ Результати успішно збережено у файл: {output_file_path}")
 print("\nПриклад даних зі знайденими топіками:")
@@ -108,7 +117,8 @@ pio.renderers.default = "browser"
 
 # Створюємо ієрархічні топіки
 try:
-    hierarchical_topics = topic_model.hierarchical_topics(sentences_to_process)
+    with metrics.stage("hierarchical_topics", rows_in=len(sentences_to_process)):
+        hierarchical_topics = topic_model.hierarchical_topics(sentences_to_process)
 
     # Візуалізуємо ієрархію
     print("⏳ Генеруємо дендрограму... Графік має відкритися у вашому браузері.")
@@ -121,6 +131,9 @@ try:
 except Exception as e:
     print(f"❌ Не вдалося згенерувати ієрархію. Помилка: {e}")
 
+metrics.print_summary()
+print(f"📁 Метрики етапів збережено у файл: {metrics.save()}")
+
 print("\n" + "="*60)
 print("✅ Скрипт NLP-обробки завершив роботу!")
 print("="*60)
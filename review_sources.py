@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Schema-aware loaders for the review exports.
+
+Every source declares which raw columns it needs, their dtypes, how they map onto the
+standardized layout and the format of its date column. Loading reads only those
+columns (`usecols`) with explicit dtypes, uses the pyarrow CSV engine when pyarrow is
+installed, parses dates once with the declared format (to UTC, so both sources share
+one datetime dtype) and returns the `combined_reviews_df` layout from
+simple-murat.ipynb directly:
+
+    id, rating, date_comment, language, title, description, source
+
+Usage:
+    combined_reviews_df = load_combined_reviews({
+        'appstore': 'data/Headway_Appstore_metrics - AppStore_reviews.csv',
+        'trustpilot': 'data/Headway_Appstore_metrics - Trustpilot_reviews.csv',
+    })
+    trustpilot_df = read_source('trustpilot', trustpilot_file)
+    combined_reviews_df = combine_reviews([appstore_df, trustpilot_df])
+"""
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+    # Arrow-backed strings are far more compact than Python object columns
+    STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    CSV_ENGINE = "c"
+    STRING_DTYPE = "string"
+
+STANDARD_COLUMNS = ['id', 'rating', 'date_comment', 'language', 'title', 'description', 'source']
+
+
+class SourceAdapter:
+    def __init__(self, key: str, source_name: str, columns: dict, dtypes: dict, date_format: str = None,
+                 utc: bool = True):
+        """
+        `columns` maps raw export header -> standardized column name,
+        `dtypes` maps raw export header -> dtype to read it with,
+        `date_format` is a strftime format or 'ISO8601'; naive dates are taken as UTC.
+        """
+        self.key = key
+        self.source_name = source_name
+        self.columns = columns
+        self.dtypes = dtypes
+        self.date_format = date_format
+        self.utc = utc
+
+    def read(self, path: str):
+        """Read the needed columns of one export and return it in the standardized layout"""
+        raw_df = pd.read_csv(path, usecols=list(self.columns), dtype=self.dtypes, engine=CSV_ENGINE)
+        return self.standardize(raw_df)
+
+    def standardize(self, raw_df):
+        """Select and rename the declared columns of an already loaded export"""
+        df = raw_df[list(self.columns)].rename(columns=self.columns)
+        df['id'] = df['id'].astype(STRING_DTYPE)
+        df['rating'] = pd.to_numeric(df['rating'], errors='coerce').astype('Int8')
+        df['date_comment'] = self._parse_dates(df['date_comment'])
+        for column in ('title', 'description'):
+            df[column] = df[column].astype(STRING_DTYPE).fillna('')
+        df['language'] = df['language'].astype('category')
+        df['source'] = self.source_name
+        return df[STANDARD_COLUMNS]
+
+    def _parse_dates(self, values):
+        if pd.api.types.is_datetime64_any_dtype(values):
+            # Already parsed by the CSV engine; normalize its tz so sources concatenate as datetimes
+            if not self.utc:
+                return values
+            return values.dt.tz_localize('UTC') if values.dt.tz is None else values.dt.tz_convert('UTC')
+        parsed = pd.to_datetime(values, format=self.date_format, errors='coerce', utc=self.utc)
+        if self.date_format and parsed.isna().all() and values.notna().any():
+            # The export format changed; fall back to inference rather than losing every date
+            print(f"⚠️ {self.source_name}: dates do not match '{self.date_format}', inferring the format")
+            parsed = pd.to_datetime(values, format='mixed', errors='coerce', utc=self.utc)
+        return parsed
+
+
+SOURCE_ADAPTERS = {}
+
+
+def register_source(adapter: SourceAdapter):
+    SOURCE_ADAPTERS[adapter.key] = adapter
+    return adapter
+
+
+register_source(SourceAdapter(
+    key='appstore',
+    source_name='App Store',
+    columns={
+        'id': 'id',
+        'rating': 'rating',
+        'date_comment': 'date_comment',
+        'language': 'language',
+        'en_title': 'title',
+        'en_content': 'description',
+    },
+    dtypes={
+        'id': STRING_DTYPE,
+        'rating': 'float32',
+        # No dtype: pyarrow parses ISO 8601 with offsets natively, forcing a string would format it back
+        'language': STRING_DTYPE,
+        'en_title': STRING_DTYPE,
+        'en_content': STRING_DTYPE,
+    },
+    # 2023-12-31T16:02:00-08:00
+    date_format='ISO8601',
+))
+
+register_source(SourceAdapter(
+    key='trustpilot',
+    source_name='Trustpilot',
+    columns={
+        'Review Id': 'id',
+        'Review Stars': 'rating',
+        'Review Created (UTC)': 'date_comment',
+        'Review Language': 'language',
+        'Review Title': 'title',
+        'Review Content': 'description',
+    },
+    dtypes={
+        'Review Id': STRING_DTYPE,
+        'Review Stars': 'float32',
+        'Review Created (UTC)': STRING_DTYPE,
+        'Review Language': STRING_DTYPE,
+        'Review Title': STRING_DTYPE,
+        'Review Content': STRING_DTYPE,
+    },
+    # 2025-06-20 3:44 (UTC, no seconds, hour not zero-padded)
+    date_format='%Y-%m-%d %H:%M',
+))
+
+
+def read_source(key: str, path: str):
+    """Load one export through its registered adapter"""
+    if key not in SOURCE_ADAPTERS:
+        raise KeyError(f"Unknown source '{key}', registered: {list(SOURCE_ADAPTERS)}")
+    return SOURCE_ADAPTERS[key].read(path)
+
+
+def combine_reviews(frames):
+    """Concatenate already standardized exports into one combined_reviews_df"""
+    combined = pd.concat(frames, ignore_index=True)
+    combined['language'] = combined['language'].astype('category')
+    combined['source'] = combined['source'].astype('category')
+    return combined
+
+
+def load_combined_reviews(paths: dict):
+    """Load several exports ({source key: path}) into one combined_reviews_df"""
+    return combine_reviews([read_source(key, path) for key, path in paths.items()])
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+Stage-level profiling for the analysis scripts.
+
+Each run collects a list of stages. A stage records wall time, CPU time, its own
+peak RSS (Linux; the process-wide peak so far is recorded alongside), rows in/out
+and rows/s; LLM stages additionally record tokens in/out, call latency percentiles
+and retry counts. At the end of the run everything is written as one JSON file to
+`metrics/<run name>-<timestamp>.json` so runs can be compared.
+
+Usage:
+    metrics = RunMetrics("custom_topic_classification")
+
+    with metrics.stage("main_topics", rows_in=len(df)) as stage:
+        ...
+        stage.rows_out = len(df)
+
+    @metrics.track("load_data")
+    def load():
+        ...
+
+    metrics.save()
+"""
+
+import atexit
+import datetime
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import resource
+import sys
+import time
+
+import numpy as np
+
+DEFAULT_METRICS_DIR = "metrics"
+
+# Highest RSS seen before a per-stage reset of the kernel's high-water mark
+_process_peak_mb = 0.0
+# Stages currently running, innermost last; a nested stage's peak is folded into its parents
+_active_stages = []
+# Listener of the current setup_nonblocking_logging() call, stopped when it is called again
+_log_listener = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    peak = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    return max(peak, _process_peak_mb)
+
+
+def _rss_high_water_mb():
+    """VmHWM from /proc/self/status in MB, None where unavailable"""
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_rss_high_water():
+    """Reset VmHWM to the current RSS (Linux >= 4.0); False where unsupported"""
+    global _process_peak_mb
+    before = _rss_high_water_mb()
+    if before is None:
+        return False
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        return False
+    # ru_maxrss follows the reset too, so remember the process-wide peak ourselves
+    _process_peak_mb = max(_process_peak_mb, before)
+    return True
+
+
+def setup_nonblocking_logging(log_file_path, level=logging.INFO,
+                              fmt='%(asctime)s - %(levelname)s - %(message)s'):
+    """
+    Configure root logging so callers only push records onto an in-memory queue;
+    a background listener thread does the file I/O. Calling it again (e.g. re-running
+    a notebook cell) stops the previous listener and closes its log file.
+    """
+    global _log_listener
+    os.makedirs(os.path.dirname(log_file_path) or ".", exist_ok=True)
+    file_handler = logging.FileHandler(log_file_path)
+    file_handler.setFormatter(logging.Formatter(fmt))
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Pass the bare message on; the file handler applies `fmt` (basicConfig would otherwise add its own)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    logging.basicConfig(level=level, handlers=[queue_handler], force=True)
+    # Only stop the previous listener once nothing logs to its queue any more
+    previous, _log_listener = _log_listener, listener
+    if previous is not None:
+        _stop_log_listener(previous)
+    return listener
+
+
+def _stop_log_listener(listener):
+    """Flush pending records, stop the listener thread and close its handlers"""
+    try:
+        listener.stop()
+    except AttributeError:
+        # Already stopped by the caller
+        pass
+    for handler in listener.handlers:
+        handler.close()
+
+
+@atexit.register
+def _stop_logging():
+    if _log_listener is not None:
+        _stop_log_listener(_log_listener)
+
+
+class Stage:
+    def __init__(self, name: str, rows_in: int = None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.retries = 0
+        self.failures = 0
+        self.latencies = []
+        self.extra = {}
+        self._wall_start = None
+        self._cpu_start = None
+        self.wall_time_s = None
+        self.cpu_time_s = None
+        self.peak_rss_mb = None
+        self.process_peak_rss_mb = None
+        self._peak_seen_mb = None
+
+    def _fold_peak(self, peak_mb):
+        if self._peak_seen_mb is not None and peak_mb is not None:
+            self._peak_seen_mb = max(self._peak_seen_mb, peak_mb)
+
+    def start(self):
+        # Resetting the high-water mark would hide the peak so far from enclosing stages
+        current_peak = _rss_high_water_mb()
+        for stage in _active_stages:
+            stage._fold_peak(current_peak)
+        self._peak_seen_mb = _rss_high_water_mb() if _reset_rss_high_water() else None
+        _active_stages.append(self)
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def stop(self):
+        self.wall_time_s = time.perf_counter() - self._wall_start
+        self.cpu_time_s = time.process_time() - self._cpu_start
+        if self in _active_stages:
+            _active_stages.remove(self)
+        self._fold_peak(_rss_high_water_mb())
+        self.peak_rss_mb = self._peak_seen_mb
+        for stage in _active_stages:
+            stage._fold_peak(self.peak_rss_mb)
+        self.process_peak_rss_mb = peak_rss_mb()
+
+    def record_llm_call(self, latency_s: float, tokens_in: int = 0, tokens_out: int = 0,
+                        retries: int = 0, failed: bool = False):
+        """Record one LLM request (after retries) within this stage"""
+        self.latencies.append(latency_s)
+        self.tokens_in += tokens_in or 0
+        self.tokens_out += tokens_out or 0
+        self.retries += retries
+        self.failures += int(failed)
+
+    def record_usage(self, response, latency_s: float, retries: int = 0):
+        """Record an OpenAI-style chat completion response"""
+        usage = getattr(response, 'usage', None)
+        self.record_llm_call(
+            latency_s,
+            tokens_in=getattr(usage, 'prompt_tokens', 0),
+            tokens_out=getattr(usage, 'completion_tokens', 0),
+            retries=retries,
+        )
+
+    def to_dict(self):
+        result = {
+            'name': self.name,
+            'wall_time_s': self.wall_time_s,
+            'cpu_time_s': self.cpu_time_s,
+            'peak_rss_mb': self.peak_rss_mb,
+            'process_peak_rss_mb': self.process_peak_rss_mb,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+        }
+        rows = self.rows_in if self.rows_in is not None else self.rows_out
+        if rows is not None and self.wall_time_s:
+            result['rows_per_s'] = rows / self.wall_time_s
+        if self.latencies:
+            latencies = np.asarray(self.latencies)
+            result['llm'] = {
+                'calls': len(latencies),
+                'tokens_in': self.tokens_in,
+                'tokens_out': self.tokens_out,
+                'retries': self.retries,
+                'failures': self.failures,
+                'latency_p50_s': float(np.percentile(latencies, 50)),
+                'latency_p90_s': float(np.percentile(latencies, 90)),
+                'latency_p99_s': float(np.percentile(latencies, 99)),
+                'latency_max_s': float(latencies.max()),
+            }
+        if self.extra:
+            result['extra'] = self.extra
+        return result
+
+
+class _StageContext:
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.stage.start()
+        return self.stage
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stage.stop()
+        if exc_type is not None:
+            self.stage.extra['error'] = f"{exc_type.__name__}: {exc}"
+        self.metrics.stages.append(self.stage)
+        logging.getLogger(__name__).info(json.dumps(self.stage.to_dict()))
+        return False
+
+
+class RunMetrics:
+    def __init__(self, run_name: str, output_dir: str = DEFAULT_METRICS_DIR):
+        self.run_name = run_name
+        self.output_dir = output_dir
+        self.started_at = datetime.datetime.now()
+        self.stages = []
+        self.info = {}
+
+    def stage(self, name: str, rows_in: int = None):
+        """Context manager that times the enclosed block as one stage"""
+        return _StageContext(self, Stage(name, rows_in=rows_in))
+
+    def track(self, name: str = None):
+        """Decorator form of `stage()`; rows_out is taken from len() of the result if possible"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name or func.__name__) as stage:
+                    result = func(*args, **kwargs)
+                    try:
+                        stage.rows_out = len(result)
+                    except TypeError:
+                        pass
+                    return result
+            return wrapper
+        return decorator
+
+    def to_dict(self):
+        return {
+            'run': self.run_name,
+            'started_at': self.started_at.isoformat(),
+            'info': self.info,
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': [stage.to_dict() for stage in self.stages],
+        }
+
+    def save(self, path: str = None):
+        """Write the run as JSON and return the file path"""
+        if path is None:
+            timestamp = self.started_at.strftime("%Y%m%dT%H%M%S")
+            path = os.path.join(self.output_dir, f"{self.run_name}-{timestamp}.json")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+        return path
+
+    def print_summary(self):
+        print(f"\n=== STAGE METRICS: {self.run_name} ===")
+        for stage in self.stages:
+            stats = stage.to_dict()
+            rate = f", {stats['rows_per_s']:,.1f} rows/s" if 'rows_per_s' in stats else ""
+            peak = (f"{stage.peak_rss_mb:.0f} MB peak" if stage.peak_rss_mb is not None
+                    else f"{stage.process_peak_rss_mb:.0f} MB process peak")
+            print(f"  {stage.name}: {stage.wall_time_s:.2f}s wall, {stage.cpu_time_s:.2f}s CPU, {peak}{rate}")
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Deterministic synthetic review generator.
+
+Produces DataFrames with the same columns and date formats as the Trustpilot and
+App Store exports used in `main.py` / `simple-murat.ipynb` (all 11 columns each, so
+column pruning on load is measured realistically), so the pipeline can be benchmarked
+at any scale without the private data. The same seed always yields the same rows.
+
+Usage:
+    trustpilot_df = generate_trustpilot_reviews(100_000, seed=0)
+    appstore_df = generate_appstore_reviews(100_000, seed=1)
+    write_synthetic_exports("data/synthetic", n_reviews=1_000_000)
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+TRUSTPILOT_COLUMNS = ['Review Id', 'Review Created (UTC)', 'Review Consumer User Id', 'Review Title',
+                      'Review Content', 'Review Stars', 'Source Of Review', 'Company Response',
+                      'Company Response Author', 'Review Language', 'Company Reply Date (UTC)']
+APPSTORE_COLUMNS = ['id', 'rating', 'title', 'content', 'date_comment', 'country', 'language', 'app_name',
+                    'en_title', 'en_content', 'dt']
+
+START_DATE = pd.Timestamp("2022-01-01", tz="UTC")
+END_DATE = pd.Timestamp("2025-06-30", tz="UTC")
+# App Store dates are exported in the store's local time with the UTC offset
+APPSTORE_TIMEZONE = "America/Los_Angeles"
+
+# Sentences per (Sub-Topic, sentiment), built around the Hierarchy Table keywords
+# from prompts/message_sentiments_prompt.md
+SENTENCE_POOL = {
+    ("App Performance", "negative"): [
+        "The app constantly crashes when I open a book.",
+        "Slow loading makes every session painful.",
+        "It self closes during playback all the time.",
+    ],
+    ("User Interface", "positive"): [
+        "Simple and user friendly interface.",
+        "Really easy to use, even for my parents.",
+    ],
+    ("User Interface", "negative"): ["Bad UX/UI, I can never find my library."],
+    ("General Usability", "positive"): [
+        "Easy to digest books on my commute.",
+        "Easy to learn and not boring at all.",
+    ],
+    ("Content Relevance", "positive"): [
+        "Insightful and relevant summaries.",
+        "Practical and solid information in every chapter.",
+    ],
+    ("Summaries Quality", "positive"): ["The summaries are well written, clear concise and straight to the point."],
+    ("Summaries Quality", "mixed"): ["Some summaries are better than others."],
+    ("Book Selection", "positive"): ["Wide selection of books to choose from."],
+    ("Book Selection", "negative"): ["Limited repertory compared to other apps."],
+    ("Subscription Complaints", "negative"): [
+        "I was charged for an annual subscription instead of a monthly one.",
+        "I didn't agree to an annual subscription.",
+    ],
+    ("Billing Problems", "negative"): [
+        "They over charged me twice this month.",
+        "Double payment and nobody explains why.",
+    ],
+    ("Cancellation & Refund Issues", "negative"): [
+        "I can't get a refund.",
+        "There is no way to cancel inside the app.",
+    ],
+    ("Misleading Advertising", "negative"): ["The trial period is a scam and the ad was misleading."],
+    ("Responsiveness", "negative"): ["No reply from support after two weeks.", "Useless support team."],
+    ("Helpfulness", "positive"): ["Customer service was helpful and responsive."],
+    ("Helpfulness", "negative"): ["The issue was not resolved."],
+    ("Overall Negative Experience", "negative"): ["Poor customer service overall."],
+    ("Knowledge Gain", "positive"): [
+        "I learn something new every day.",
+        "It helps broaden your knowledge quickly.",
+    ],
+    ("Habit Formation", "positive"): ["The habit training summaries are improving my mental health."],
+    ("Alternative to Social Media", "positive"): ["It kept me from mindless scrolling on social media."],
+    ("Audio Quality", "negative"): ["The robotic voice ruins the audio.", "Mechanical voices everywhere."],
+    ("Audio Quality", "positive"): ["The recording quality is quite amazing."],
+    ("Narration Style", "negative"): ["Narration is monotonous and the inflections are often off."],
+    ("Human vs. AI Voice", "negative"): ["Human readers would be so much better than this AI voice."],
+    ("Language Options", "negative"): ["I wish the app was available in spanish."],
+    ("Localization Issues", "negative"): ["There is no way to change language in settings."],
+}
+FILLER_SENTENCES = [
+    "I have been using it for a few months.",
+    "Overall it is okay.",
+    "My friend recommended it to me.",
+    "Update: still the same.",
+]
+TITLES = {
+    "positive": ["Great app", "Love it", "Very useful", "Worth it"],
+    "negative": ["Disappointed", "Scam", "Terrible support", "Do not buy"],
+    "mixed": ["Good but", "Could be better", "Mixed feelings"],
+}
+LANGUAGES = np.array(["en", "en", "en", "en", "de", "es", "fr", "uk"])
+# The App Store export spells languages out
+LANGUAGE_NAMES = {"en": "english", "de": "german", "es": "spanish", "fr": "french", "uk": "ukrainian"}
+COUNTRIES = np.array(["USA", "USA", "GBR", "CAN", "AUS", "IND", "DEU", "ROU", "ARM"])
+TRUSTPILOT_ORIGINS = np.array(["InvitationLinkApi", "InvitationLinkApi", "Organic", "AFSv2"])
+COMPANY_REPLIES = [
+    "Hi! We're sorry to hear that. Please contact our support team so we can look into it.",
+    "Thank you for your feedback! We're happy you enjoy Headway.",
+]
+APP_NAME = "Headway: Fun & easy growth"
+
+# Star rating distribution per sentiment
+STARS_BY_SENTIMENT = {
+    "positive": ([4, 5], [0.3, 0.7]),
+    "negative": ([1, 2, 3], [0.6, 0.25, 0.15]),
+    "mixed": ([2, 3, 4], [0.3, 0.4, 0.3]),
+}
+
+_POOL_KEYS = list(SENTENCE_POOL.keys())
+_SENTIMENTS = ["positive", "negative", "mixed"]
+
+
+def _generate_core(n_reviews: int, seed: int, empty_content_rate: float):
+    """Shared generator returning plain arrays; schema-specific wrappers rename them"""
+    rng = np.random.default_rng(seed)
+
+    sentiments = rng.choice(_SENTIMENTS, size=n_reviews, p=[0.45, 0.45, 0.10])
+    keys_by_sentiment = {s: [k for k in _POOL_KEYS if k[1] == s] or _POOL_KEYS for s in _SENTIMENTS}
+
+    stars = np.empty(n_reviews, np.int8)
+    for sentiment in _SENTIMENTS:
+        mask = sentiments == sentiment
+        values, probs = STARS_BY_SENTIMENT[sentiment]
+        stars[mask] = rng.choice(values, size=int(mask.sum()), p=probs)
+
+    n_sentences = rng.integers(1, 6, size=n_reviews)
+    topic_draws = rng.random((n_reviews, 5))
+    variant_draws = rng.integers(0, 1 << 16, size=(n_reviews, 5))
+    filler_draws = rng.random((n_reviews, 5)) < 0.2
+    empty = rng.random(n_reviews) < empty_content_rate
+
+    contents = []
+    titles = []
+    for i in range(n_reviews):
+        keys = keys_by_sentiment[sentiments[i]]
+        title_pool = TITLES[sentiments[i]]
+        titles.append(title_pool[variant_draws[i, 0] % len(title_pool)])
+        if empty[i]:
+            contents.append("")
+            continue
+        parts = []
+        for j in range(n_sentences[i]):
+            if filler_draws[i, j]:
+                parts.append(FILLER_SENTENCES[variant_draws[i, j] % len(FILLER_SENTENCES)])
+            else:
+                pool = SENTENCE_POOL[keys[int(topic_draws[i, j] * len(keys))]]
+                parts.append(pool[variant_draws[i, j] % len(pool)])
+        contents.append(" ".join(parts))
+
+    span_s = int((END_DATE - START_DATE).total_seconds())
+    dates = START_DATE + pd.to_timedelta(np.sort(rng.integers(0, span_s, size=n_reviews)), unit="s")
+
+    return {
+        'stars': stars,
+        'dates': dates,
+        'titles': titles,
+        'contents': contents,
+        'languages': rng.choice(LANGUAGES, size=n_reviews),
+    }
+
+
+def _trustpilot_dates(dates):
+    """'2025-06-20 3:44': UTC, no seconds, hour not zero-padded"""
+    minutes = pd.Series(np.datetime_as_string(dates.tz_localize(None).values, unit="m"))
+    return minutes.str[:11].str.replace("T", " ") + dates.hour.astype(str) + minutes.str[13:].values
+
+
+def _appstore_dates(dates):
+    """'2023-12-31T16:02:00-08:00': ISO 8601 in local time with the UTC offset"""
+    local = dates.tz_convert(APPSTORE_TIMEZONE).tz_localize(None)
+    offset_min = ((local - dates.tz_localize(None)) // pd.Timedelta(minutes=1)).values
+    offsets = {value: f"{'-' if value < 0 else '+'}{abs(value) // 60:02d}:{abs(value) % 60:02d}"
+               for value in np.unique(offset_min)}
+    return (pd.Series(np.datetime_as_string(local.values, unit="s"))
+            + pd.Series(offset_min).map(offsets))
+
+
+def generate_trustpilot_reviews(n_reviews: int, seed: int = 0, empty_content_rate: float = 0.02,
+                                reply_rate: float = 0.1):
+    """Synthetic reviews with the Trustpilot export header"""
+    core = _generate_core(n_reviews, seed, empty_content_rate)
+    rng = np.random.default_rng(seed + 10_000)
+    ids = [f"{value:024x}" for value in rng.integers(0, 1 << 62, size=n_reviews)]
+    user_ids = [f"{value:024x}" for value in rng.integers(0, 1 << 62, size=n_reviews)]
+    replied = rng.random(n_reviews) < reply_rate
+    replies = pd.Series(np.array(COMPANY_REPLIES)[(core['stars'] >= 4).astype(int)]).where(replied)
+    reply_dates = core['dates'] + pd.to_timedelta(rng.integers(3600, 7 * 86400, size=n_reviews), unit="s")
+    return pd.DataFrame({
+        'Review Id': ids,
+        'Review Created (UTC)': _trustpilot_dates(core['dates']),
+        'Review Consumer User Id': user_ids,
+        'Review Title': core['titles'],
+        'Review Content': core['contents'],
+        'Review Stars': core['stars'],
+        'Source Of Review': rng.choice(TRUSTPILOT_ORIGINS, size=n_reviews),
+        'Company Response': replies,
+        'Company Response Author': pd.Series("Headway", index=replies.index).where(replied),
+        'Review Language': core['languages'],
+        'Company Reply Date (UTC)': _trustpilot_dates(reply_dates).where(replied),
+    }, columns=TRUSTPILOT_COLUMNS)
+
+
+def generate_appstore_reviews(n_reviews: int, seed: int = 1, empty_content_rate: float = 0.05):
+    """Synthetic reviews with the App Store export header"""
+    core = _generate_core(n_reviews, seed, empty_content_rate)
+    rng = np.random.default_rng(seed + 20_000)
+    ids = [f"00000056-dae4-2802-{value >> 48:04x}-{value & 0xFFFFFFFFFFFF:012x}"
+           for value in rng.integers(0, 1 << 62, size=n_reviews)]
+    return pd.DataFrame({
+        'id': ids,
+        'rating': core['stars'],
+        # Original-language text; the synthetic reviews are written in English already
+        'title': core['titles'],
+        'content': [content.lower() for content in core['contents']],
+        'date_comment': _appstore_dates(core['dates']),
+        'country': rng.choice(COUNTRIES, size=n_reviews),
+        'language': [LANGUAGE_NAMES[language] for language in core['languages']],
+        'app_name': APP_NAME,
+        'en_title': core['titles'],
+        'en_content': core['contents'],
+        'dt': np.datetime_as_string(core['dates'].tz_localize(None).values, unit="D"),
+    }, columns=APPSTORE_COLUMNS)
+
+
+def write_synthetic_exports(output_dir: str, n_reviews: int, seed: int = 0):
+    """Write both exports under the same file names `main.py` expects; returns the two paths"""
+    os.makedirs(output_dir, exist_ok=True)
+    trustpilot_path = os.path.join(output_dir, "Headway_Appstore_metrics - Trustpilot_reviews.csv")
+    appstore_path = os.path.join(output_dir, "Headway_Appstore_metrics - AppStore_reviews.csv")
+    generate_trustpilot_reviews(n_reviews, seed=seed).to_csv(trustpilot_path, index=False)
+    generate_appstore_reviews(n_reviews, seed=seed + 1).to_csv(appstore_path, index=False)
+    return trustpilot_path, appstore_path
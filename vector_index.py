@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+Local semantic index over review sentence embeddings.
+
+Vectors and per-sentence attributes live in flat binary files inside one
+directory and are memory-mapped on open, so the corpus never has to fit in RAM.
+
+Two backends are available:
+- "flat": exact brute-force cosine search (chunked NumPy matmul), for small corpora.
+- "ivf":  inverted-file approximate search. Vectors are clustered with k-means,
+          rows are stored grouped by cluster and only the `nprobe` closest
+          clusters are scanned per query. Rows added after `train()` go into an
+          unsorted tail that is always scanned exactly until the next `train()`.
+          With filters, more clusters are probed until k matching rows are found;
+          a filter that matches fewer rows than the probes would scan is answered
+          with an exact scan of just those rows.
+
+Usage:
+    index = SentenceIndex.create("index/sentences", dim=384, backend="ivf")
+    index.add(embeddings, sources=df['source'], ratings=df['rating'],
+              categories=df['category'], dates=df['date_comment'])
+    index.train(nlist=1024)
+    scores, ids = index.search(query_vectors, k=50, source="Trustpilot", rating=[1, 2])
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+ATTR_DTYPE = np.dtype([
+    ('source', np.int16),
+    ('rating', np.int8),
+    ('category', np.int16),
+    ('date', np.int32),  # days since 1970-01-01, MISSING_DATE if unknown
+])
+MISSING_CODE = -1
+MISSING_DATE = np.iinfo(np.int32).min
+
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.f32"
+ATTRS_FILE = "attrs.bin"
+CENTROIDS_FILE = "centroids.npy"
+ORDER_FILE = "order.i64"
+
+SEARCH_CHUNK_ROWS = 262_144
+
+
+def _normalize(vectors):
+    """L2-normalize rows so that dot product equals cosine similarity"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores, k):
+    """Return (scores, positions) of the k best columns per row, best first"""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), np.float32), np.empty((scores.shape[0], 0), np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    return np.take_along_axis(part_scores, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+def _merge_top_k(best_scores, best_ids, scores, ids, k):
+    """Merge a new candidate block into a running top-k"""
+    all_scores = np.concatenate([best_scores, scores], axis=1)
+    all_ids = np.concatenate([best_ids, ids], axis=1)
+    top_scores, pos = _top_k(all_scores, k)
+    return top_scores, np.take_along_axis(all_ids, pos, axis=1)
+
+
+def _kmeans(sample, nlist, n_iter=20, seed=0):
+    """Spherical k-means on normalized vectors, returns normalized centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters from random sample points
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class SentenceIndex:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE), "r") as file:
+            self.meta = json.load(file)
+        self.dim = self.meta['dim']
+        self._source_codes = {name: i for i, name in enumerate(self.meta['sources'])}
+        self._category_codes = {name: i for i, name in enumerate(self.meta['categories'])}
+        self._map()
+
+    # ------------------------------------------------------------------
+    # Creation / persistence
+    # ------------------------------------------------------------------
+    @classmethod
+    def create(cls, path: str, dim: int, backend: str = "flat"):
+        """Create an empty index directory"""
+        if backend not in ("flat", "ivf"):
+            raise ValueError(f"Unknown backend '{backend}', expected 'flat' or 'ivf'")
+        os.makedirs(path, exist_ok=True)
+        meta = {
+            'dim': int(dim),
+            'backend': backend,
+            'count': 0,
+            'sources': [],
+            'categories': [],
+            'nlist': 0,
+            'offsets': [],
+            'trained_count': 0,
+        }
+        with open(os.path.join(path, META_FILE), "w") as file:
+            json.dump(meta, file)
+        for name in (VECTORS_FILE, ATTRS_FILE):
+            open(os.path.join(path, name), "wb").close()
+        return cls(path)
+
+    @classmethod
+    def open(cls, path: str):
+        return cls(path)
+
+    def _save_meta(self):
+        tmp_path = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(self.meta, file)
+        os.replace(tmp_path, os.path.join(self.path, META_FILE))
+
+    def _map(self):
+        """(Re)open the memory maps for the current row count"""
+        count = self.meta['count']
+        if count:
+            self.vectors = np.memmap(os.path.join(self.path, VECTORS_FILE), dtype=np.float32,
+                                     mode='r', shape=(count, self.dim))
+            self.attrs = np.memmap(os.path.join(self.path, ATTRS_FILE), dtype=ATTR_DTYPE,
+                                   mode='r', shape=(count,))
+        else:
+            self.vectors = np.empty((0, self.dim), np.float32)
+            self.attrs = np.empty((0,), ATTR_DTYPE)
+
+        self.centroids = None
+        self.order = None
+        if self.meta['nlist']:
+            self.centroids = np.load(os.path.join(self.path, CENTROIDS_FILE), mmap_mode='r')
+            self.order = np.memmap(os.path.join(self.path, ORDER_FILE), dtype=np.int64,
+                                   mode='r', shape=(self.meta['trained_count'],))
+
+    def __len__(self):
+        return self.meta['count']
+
+    # ------------------------------------------------------------------
+    # Insertion
+    # ------------------------------------------------------------------
+    def _encode_labels(self, values, vocab_key, codes, n):
+        if values is None:
+            return np.full(n, MISSING_CODE, np.int16)
+        encoded = np.empty(n, np.int16)
+        for i, value in enumerate(values):
+            if value is None or (isinstance(value, float) and np.isnan(value)):
+                encoded[i] = MISSING_CODE
+                continue
+            value = str(value)
+            if value not in codes:
+                codes[value] = len(self.meta[vocab_key])
+                self.meta[vocab_key].append(value)
+            encoded[i] = codes[value]
+        return encoded
+
+    def _write_rows(self, name, rows, row_nbytes):
+        """
+        Write rows right after the committed ones. Anything past `count` is left over
+        from an interrupted add() and is overwritten / cut off, so ids stay aligned.
+        """
+        with open(os.path.join(self.path, name), "r+b") as file:
+            file.seek(self.meta['count'] * row_nbytes)
+            file.write(rows.tobytes())
+            file.truncate()
+
+    def add(self, vectors, sources=None, ratings=None, categories=None, dates=None):
+        """
+        Append vectors (and optional per-row attributes) to the index.
+        Returns the ids assigned to the new rows.
+        """
+        vectors = _normalize(vectors)
+        n = len(vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+
+        attrs = np.empty(n, ATTR_DTYPE)
+        attrs['source'] = self._encode_labels(sources, 'sources', self._source_codes, n)
+        attrs['category'] = self._encode_labels(categories, 'categories', self._category_codes, n)
+        if ratings is None:
+            attrs['rating'] = MISSING_CODE
+        else:
+            attrs['rating'] = pd.to_numeric(pd.Series(ratings), errors='coerce').fillna(MISSING_CODE).to_numpy()
+        if dates is None:
+            attrs['date'] = MISSING_DATE
+        else:
+            days = pd.to_datetime(pd.Series(dates), errors='coerce').dt.floor('D')
+            attrs['date'] = np.where(days.isna(), MISSING_DATE,
+                                     days.values.astype('datetime64[D]').astype(np.int64))
+
+        self._write_rows(VECTORS_FILE, vectors, self.dim * vectors.itemsize)
+        self._write_rows(ATTRS_FILE, attrs, ATTR_DTYPE.itemsize)
+
+        first_id = self.meta['count']
+        self.meta['count'] += n
+        self._save_meta()
+        self._map()
+        return np.arange(first_id, first_id + n)
+
+    # ------------------------------------------------------------------
+    # IVF training
+    # ------------------------------------------------------------------
+    def train(self, nlist: int = None, sample_size: int = 100_000, n_iter: int = 20, seed: int = 0):
+        """
+        Cluster the current vectors and rewrite the row order grouped by cluster.
+        Only meaningful for the "ivf" backend; call again after large insertions.
+        """
+        if self.meta['backend'] != "ivf":
+            raise ValueError("train() is only available for the 'ivf' backend")
+        count = self.meta['count']
+        if count == 0:
+            raise ValueError("Cannot train an empty index")
+        if nlist is None:
+            nlist = max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(seed)
+        sample_ids = np.sort(rng.choice(count, size=min(sample_size, count), replace=False))
+        # k-means needs at least one sample row per centroid
+        nlist = min(nlist, len(sample_ids))
+        centroids = _kmeans(np.asarray(self.vectors[sample_ids]), nlist, n_iter=n_iter, seed=seed)
+
+        assign = np.empty(count, np.int32)
+        for start in range(0, count, SEARCH_CHUNK_ROWS):
+            chunk = np.asarray(self.vectors[start:start + SEARCH_CHUNK_ROWS])
+            assign[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind='stable').astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+
+        np.save(os.path.join(self.path, CENTROIDS_FILE), centroids)
+        order.tofile(os.path.join(self.path, ORDER_FILE))
+        self.meta['nlist'] = int(nlist)
+        self.meta['offsets'] = offsets.tolist()
+        self.meta['trained_count'] = int(count)
+        self._save_meta()
+        self._map()
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def _filter_mask(self, attrs, source=None, rating=None, category=None, date_from=None, date_to=None):
+        mask = np.ones(len(attrs), bool)
+        if source is not None:
+            codes = [self._source_codes.get(s, -2) for s in np.atleast_1d(source)]
+            mask &= np.isin(attrs['source'], codes)
+        if category is not None:
+            codes = [self._category_codes.get(c, -2) for c in np.atleast_1d(category)]
+            mask &= np.isin(attrs['category'], codes)
+        if rating is not None:
+            mask &= np.isin(attrs['rating'], np.atleast_1d(rating))
+        if date_from is not None:
+            mask &= attrs['date'] >= pd.Timestamp(date_from).value // 86_400_000_000_000
+        if date_to is not None:
+            mask &= (attrs['date'] != MISSING_DATE) & \
+                    (attrs['date'] <= pd.Timestamp(date_to).value // 86_400_000_000_000)
+        return mask
+
+    def _matching_ids(self, filters):
+        """Row ids passing the filters, computed in chunks over the attribute map"""
+        total = self.meta['count']
+        matching = [start + np.flatnonzero(self._filter_mask(self.attrs[start:start + SEARCH_CHUNK_ROWS], **filters))
+                    for start in range(0, total, SEARCH_CHUNK_ROWS)]
+        return np.concatenate(matching) if matching else np.empty(0, np.int64)
+
+    def _scan(self, queries, ids, k, filters):
+        """Exact search over the given row ids (None means all rows), in chunks"""
+        m = len(queries)
+        best_scores = np.full((m, 0), -np.inf, np.float32)
+        best_ids = np.empty((m, 0), np.int64)
+        total = self.meta['count'] if ids is None else len(ids)
+
+        for start in range(0, total, SEARCH_CHUNK_ROWS):
+            if ids is None:
+                chunk_ids = np.arange(start, min(start + SEARCH_CHUNK_ROWS, total))
+                vectors = self.vectors[start:start + SEARCH_CHUNK_ROWS]
+                attrs = self.attrs[start:start + SEARCH_CHUNK_ROWS]
+            else:
+                chunk_ids = ids[start:start + SEARCH_CHUNK_ROWS]
+                vectors = self.vectors[chunk_ids]
+                attrs = self.attrs[chunk_ids]
+
+            if filters:
+                keep = self._filter_mask(attrs, **filters)
+                if not keep.any():
+                    continue
+                chunk_ids = chunk_ids[keep]
+                vectors = np.asarray(vectors)[keep]
+
+            scores = queries @ np.asarray(vectors).T
+            top_scores, pos = _top_k(scores, k)
+            best_scores, best_ids = _merge_top_k(best_scores, best_ids, top_scores, chunk_ids[pos], k)
+        return best_scores, best_ids
+
+    def search(self, queries, k: int = 50, nprobe: int = 8, source=None, rating=None,
+               category=None, date_from=None, date_to=None):
+        """
+        Find the k most similar sentences for each query vector.
+
+        `queries` may be a single vector or a (m, dim) batch. Filters accept a single
+        value or a list of values; dates are inclusive. Returns (scores, ids), each
+        of shape (m, <=k), best match first.
+        """
+        queries = _normalize(queries)
+        filters = {key: value for key, value in dict(source=source, rating=rating, category=category,
+                                                     date_from=date_from, date_to=date_to).items()
+                   if value is not None}
+
+        if self.meta['backend'] == "flat" or not self.meta['nlist']:
+            return self._scan(queries, None, k, filters)
+
+        offsets = self.meta['offsets']
+        trained = self.meta['trained_count']
+        nlist = self.meta['nlist']
+        tail_ids = np.arange(trained, self.meta['count'])
+        nprobe = min(nprobe, nlist)
+
+        allowed = None
+        if filters:
+            matching = self._matching_ids(filters)
+            if len(matching) <= trained * nprobe / nlist + len(tail_ids):
+                # Selective filter: scanning the matching rows exactly is no more work than probing
+                return self._scan(queries, matching, k, {})
+            allowed = np.zeros(self.meta['count'], bool)
+            allowed[matching] = True
+            # Probing widens until k rows pass the filter, so rank every cluster up front
+            probes = np.argsort(-(queries @ np.asarray(self.centroids).T), axis=1)
+        else:
+            probes = _top_k(queries @ np.asarray(self.centroids).T, nprobe)[1]
+
+        all_scores, all_ids = [], []
+        for query, query_probes in zip(queries, probes):
+            best_scores = np.full((1, 0), -np.inf, np.float32)
+            best_ids = np.empty((1, 0), np.int64)
+            probed, width = 0, nprobe
+            while True:
+                candidate_ids = np.concatenate(
+                    [self.order[offsets[c]:offsets[c + 1]] for c in query_probes[probed:width]]
+                    + ([tail_ids] if probed == 0 else []))
+                if allowed is not None:
+                    candidate_ids = candidate_ids[allowed[candidate_ids]]
+                # Sorted ids give sequential reads on the memory map
+                candidate_ids.sort()
+                scores, ids = self._scan(query[None, :], candidate_ids, k, {})
+                best_scores, best_ids = _merge_top_k(best_scores, best_ids, scores, ids, k)
+                probed = width
+                if allowed is None or best_ids.shape[1] >= k or probed >= nlist:
+                    break
+                width = min(2 * width, nlist)
+            all_scores.append(best_scores[0])
+            all_ids.append(best_ids[0])
+
+        width = max((len(s) for s in all_scores), default=0)
+        out_scores = np.full((len(queries), width), -np.inf, np.float32)
+        out_ids = np.full((len(queries), width), -1, np.int64)
+        for i, (scores, ids) in enumerate(zip(all_scores, all_ids)):
+            out_scores[i, :len(scores)] = scores
+            out_ids[i, :len(ids)] = ids
+        return out_scores, out_ids
+
+
+def embed_sentences(sentences, model_name: str = DEFAULT_EMBEDDING_MODEL, batch_size: int = 256):
+    """Encode sentences with the same sentence-transformers model BERTopic uses by default"""
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name)
+    return model.encode(list(sentences), batch_size=batch_size, show_progress_bar=True,
+                        convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
+
+
+def build_index_from_df(df, path: str, backend: str = "flat", text_column: str = 'sentence',
+                        category_column: str = 'Main Topic', model_name: str = DEFAULT_EMBEDDING_MODEL,
+                        batch_size: int = 50_000):
+    """
+    Embed an expanded sentence DataFrame (see `expanded_df.csv`) and index it.
+    Index ids match the positional row numbers of `df`.
+    """
+    df = df.reset_index(drop=True)
+    index = None
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start:start + batch_size]
+        vectors = embed_sentences(batch[text_column].astype(str), model_name=model_name)
+        if index is None:
+            index = SentenceIndex.create(path, dim=vectors.shape[1], backend=backend)
+        index.add(
+            vectors,
+            sources=batch['source'] if 'source' in batch else None,
+            ratings=batch['rating'] if 'rating' in batch else None,
+            categories=batch[category_column] if category_column in batch else None,
+            dates=batch['date_comment'] if 'date_comment' in batch else None,
+        )
+    if index is not None and backend == "ivf":
+        index.train()
+    return index
@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Work-queue execution mode for sentence classification.
+
+A coordinator splits the input CSV into shards and registers them in a queue. Worker
+processes on any number of machines claim shards under a time-limited lease, run the
+zero-shot or LLM classifier and write one partial output file per shard. A worker that
+crashes stops renewing its lease, so its shard becomes claimable again once the lease
+expires. A final merge step concatenates the partial outputs in shard order.
+
+Queues:
+- sqlite:///path/to/queue.db  - local file, fine for many processes on one machine
+- redis://host:6379/0         - any Redis-compatible server (Redis, Valkey, KeyDB, ...)
+
+Shard inputs and outputs live under --workdir, which every worker must be able to
+read and write (a local disk for a single machine, a shared mount for several).
+
+Usage:
+    python work_queue.py split --queue sqlite:///queue.db --job sentences --input df/expanded_df.csv \\
+        --workdir shards --shard-size 5000
+    python work_queue.py work --queue sqlite:///queue.db --job sentences --classifier zero-shot
+    python work_queue.py work --queue redis://queue-host:6379/0 --job sentences --classifier llm \\
+        --llm-config creds/llm_backends.yml
+    python work_queue.py status --queue sqlite:///queue.db --job sentences
+    python work_queue.py merge --queue sqlite:///queue.db --job sentences --output labeled.csv
+"""
+
+import argparse
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from stage_metrics import RunMetrics
+
+DEFAULT_LEASE_S = 600
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_MAX_FAILURES = 3
+DEFAULT_FAILURE_BACKOFF_S = 5.0
+SHARD_COLUMNS = ['job', 'shard_id', 'input_path', 'rows', 'state', 'worker', 'lease_until', 'attempts',
+                 'output_path', 'error']
+ZERO_SHOT_MODEL = "valhalla/distilbart-mnli-12-3"
+PROMPT_PATH = "prompts/message_sentiments_prompt.md"
+
+
+# =============================================================================
+# Queue backends
+# =============================================================================
+class SQLiteQueue:
+    def __init__(self, path: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS shards (
+                    job TEXT NOT NULL,
+                    shard_id INTEGER NOT NULL,
+                    input_path TEXT NOT NULL,
+                    rows INTEGER NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    lease_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    output_path TEXT,
+                    error TEXT,
+                    PRIMARY KEY (job, shard_id)
+                )
+            """)
+
+    def _connect(self):
+        # One connection per thread; WAL lets readers run while a worker commits
+        if getattr(self._local, 'conn', None) is None:
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return self._local.conn
+
+    def add_shards(self, job, shards):
+        """shards: [(shard_id, input_path, rows)]"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("INSERT OR REPLACE INTO shards (job, shard_id, input_path, rows) VALUES (?, ?, ?, ?)",
+                         [(job, shard_id, path, rows) for shard_id, path, rows in shards])
+        conn.execute("COMMIT")
+
+    def claim(self, job, worker, lease_s):
+        """Lease the next pending or expired shard; returns (shard_id, input_path) or None"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Shards whose last allowed attempt crashed are given up on
+            conn.execute("""
+                UPDATE shards SET state = 'failed'
+                WHERE job = ? AND state = 'leased' AND lease_until < ? AND attempts >= ?
+            """, (job, now, self.max_attempts))
+            row = conn.execute("""
+                SELECT shard_id, input_path FROM shards
+                WHERE job = ? AND attempts < ?
+                  AND (state = 'pending' OR (state = 'leased' AND lease_until < ?))
+                ORDER BY shard_id LIMIT 1
+            """, (job, self.max_attempts, now)).fetchone()
+            if row is not None:
+                conn.execute("""
+                    UPDATE shards SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1
+                    WHERE job = ? AND shard_id = ?
+                """, (worker, now + lease_s, job, row[0]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def renew(self, job, shard_id, worker, lease_s):
+        """Extend a lease; False if the shard was taken over by someone else"""
+        cursor = self._connect().execute("""
+            UPDATE shards SET lease_until = ? WHERE job = ? AND shard_id = ? AND worker = ? AND state = 'leased'
+        """, (time.time() + lease_s, job, shard_id, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, job, shard_id, worker, output_path):
+        cursor = self._connect().execute("""
+            UPDATE shards SET state = 'done', output_path = ?, lease_until = NULL, error = NULL
+            WHERE job = ? AND shard_id = ? AND worker = ? AND state = 'leased'
+        """, (output_path, job, shard_id, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, job, shard_id, worker, error):
+        """Give the shard back immediately; it is retried until max_attempts"""
+        self._connect().execute("""
+            UPDATE shards SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                              worker = NULL, lease_until = NULL, error = ?
+            WHERE job = ? AND shard_id = ? AND worker = ? AND state = 'leased'
+        """, (self.max_attempts, error[:2000], job, shard_id, worker))
+
+    def shards(self, job):
+        """All shards of a job as a DataFrame"""
+        return pd.read_sql_query("SELECT * FROM shards WHERE job = ? ORDER BY shard_id", self._connect(),
+                                 params=(job,))
+
+
+# Claims the lowest shard whose lease score is <= now (pending shards have score 0)
+_REDIS_CLAIM = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+while true do
+    local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, 1)
+    if #ids == 0 then return false end
+    local id = ids[1]
+    local shard_key = KEYS[2] .. id
+    local attempts = redis.call('HINCRBY', shard_key, 'attempts', 1)
+    if attempts <= tonumber(ARGV[3]) then
+        redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), id)
+        redis.call('HSET', shard_key, 'state', 'leased', 'worker', ARGV[1], 'lease_until', now + tonumber(ARGV[2]))
+        return {id, redis.call('HGET', shard_key, 'input_path')}
+    end
+    -- Out of attempts: give up on this shard and look at the next one
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('HSET', shard_key, 'state', 'failed')
+end
+"""
+
+_REDIS_RENEW = """
+if redis.call('HGET', KEYS[2], 'worker') ~= ARGV[1] or redis.call('HGET', KEYS[2], 'state') ~= 'leased' then
+    return 0
+end
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+redis.call('ZADD', KEYS[1], 'XX', now + tonumber(ARGV[3]), ARGV[2])
+redis.call('HSET', KEYS[2], 'lease_until', now + tonumber(ARGV[3]))
+return 1
+"""
+
+_REDIS_FINISH = """
+if redis.call('HGET', KEYS[2], 'worker') ~= ARGV[1] or redis.call('HGET', KEYS[2], 'state') ~= 'leased' then
+    return 0
+end
+if ARGV[3] == 'done' then
+    redis.call('ZREM', KEYS[1], ARGV[2])
+    redis.call('HSET', KEYS[2], 'state', 'done', 'output_path', ARGV[4])
+    redis.call('HDEL', KEYS[2], 'error')
+else
+    redis.call('ZADD', KEYS[1], 0, ARGV[2])
+    redis.call('HSET', KEYS[2], 'state', 'pending', 'error', ARGV[4])
+    redis.call('HDEL', KEYS[2], 'worker')
+end
+return 1
+"""
+
+
+class RedisQueue:
+    def __init__(self, url: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS, prefix: str = "wq"):
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.max_attempts = max_attempts
+        self.prefix = prefix
+        self._claim = self.client.register_script(_REDIS_CLAIM)
+        self._renew = self.client.register_script(_REDIS_RENEW)
+        self._finish = self.client.register_script(_REDIS_FINISH)
+
+    def _leases_key(self, job):
+        return f"{self.prefix}:{job}:leases"
+
+    def _shard_prefix(self, job):
+        return f"{self.prefix}:{job}:shard:"
+
+    def add_shards(self, job, shards):
+        pipe = self.client.pipeline()
+        for shard_id, path, rows in shards:
+            pipe.delete(self._shard_prefix(job) + str(shard_id))
+            pipe.hset(self._shard_prefix(job) + str(shard_id),
+                      mapping={'input_path': path, 'rows': rows, 'state': 'pending', 'attempts': 0})
+            pipe.zadd(self._leases_key(job), {str(shard_id): 0})
+        pipe.sadd(f"{self.prefix}:{job}:ids", *[str(shard_id) for shard_id, _, _ in shards])
+        pipe.execute()
+
+    def claim(self, job, worker, lease_s):
+        result = self._claim(keys=[self._leases_key(job), self._shard_prefix(job)],
+                             args=[worker, lease_s, self.max_attempts])
+        return (int(result[0]), result[1]) if result else None
+
+    def renew(self, job, shard_id, worker, lease_s):
+        return bool(self._renew(keys=[self._leases_key(job), self._shard_prefix(job) + str(shard_id)],
+                                args=[worker, str(shard_id), lease_s]))
+
+    def complete(self, job, shard_id, worker, output_path):
+        return bool(self._finish(keys=[self._leases_key(job), self._shard_prefix(job) + str(shard_id)],
+                                 args=[worker, str(shard_id), 'done', output_path]))
+
+    def fail(self, job, shard_id, worker, error):
+        self._finish(keys=[self._leases_key(job), self._shard_prefix(job) + str(shard_id)],
+                     args=[worker, str(shard_id), 'pending', error[:2000]])
+
+    def shards(self, job):
+        ids = sorted(int(shard_id) for shard_id in self.client.smembers(f"{self.prefix}:{job}:ids"))
+        pipe = self.client.pipeline()
+        for shard_id in ids:
+            pipe.hgetall(self._shard_prefix(job) + str(shard_id))
+        rows = [{'job': job, 'shard_id': shard_id, **fields} for shard_id, fields in zip(ids, pipe.execute())]
+        # Hash fields only appear once set (lease_until, output_path, ...); keep the SQLite layout
+        return pd.DataFrame(rows, columns=SHARD_COLUMNS)
+
+
+def open_queue(url: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+    """sqlite:///path.db or redis://host:port/db"""
+    if url.startswith("sqlite:///"):
+        return SQLiteQueue(url[len("sqlite:///"):], max_attempts=max_attempts)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisQueue(url, max_attempts=max_attempts)
+    raise ValueError(f"Unsupported queue URL '{url}', expected sqlite:///... or redis://...")
+
+
+# =============================================================================
+# Classifiers
+# =============================================================================
+def make_zero_shot_classifier(model_name=ZERO_SHOT_MODEL, batch_size=32, text_column='sentence'):
+    """Two-stage hierarchical zero-shot classification from custom_topic_classification.py"""
+    import torch
+    from transformers import pipeline
+
+    from classification_schema import ClassificationSchema
+
+    hierarchy = ClassificationSchema.from_prompt_file(PROMPT_PATH).hierarchy
+    main_topics = list(hierarchy)
+    device = "mps" if torch.backends.mps.is_available() else "cuda" if torch.cuda.is_available() else "cpu"
+    classifier = pipeline("zero-shot-classification", model=model_name, device=device)
+
+    def classify(df):
+        sentences = df[text_column].astype(str).tolist()
+        results = classifier(sentences, candidate_labels=main_topics, batch_size=batch_size, multi_label=False)
+        df['Main Topic'] = [res['labels'][0] for res in results]
+        df['Sub-Topic'] = "N/A"
+        for main_topic, group_df in df.groupby('Main Topic'):
+            sub_topic_candidates = list(hierarchy.get(main_topic, {}))
+            if not sub_topic_candidates:
+                continue
+            sub_results = classifier(group_df[text_column].astype(str).tolist(),
+                                     candidate_labels=sub_topic_candidates, batch_size=batch_size,
+                                     multi_label=False)
+            df.loc[group_df.index, 'Sub-Topic'] = [res['labels'][0] for res in sub_results]
+        return df
+
+    return classify
+
+
+class PartialShardError(RuntimeError):
+    """Raised by a classifier that labeled only part of a shard; `df` holds the rows done so far"""
+
+    def __init__(self, df, message):
+        super().__init__(message)
+        self.df = df
+
+
+LLM_COLUMNS = ["sentiment", "priority_level", "category", "subcategory", "confidence_score", "keywords"]
+
+
+def make_llm_classifier(config_path, text_column='sentence'):
+    """Prompt-based classification through the multi-provider router"""
+    from llm_router import LLMRouter
+
+    with open(PROMPT_PATH, 'r', encoding='utf-8') as file:
+        prompt_template = file.read()
+    router = LLMRouter.from_config(config_path)
+
+    def classify(df):
+        for key in LLM_COLUMNS:
+            if key not in df:
+                df[key] = None
+        # A retried shard starts from its partial output, so only the missing rows are re-sent
+        todo = df.index[df['category'].isna()]
+        texts = df.loc[todo, text_column].astype(str).tolist()
+        results = router.classify_many([prompt_template % (text) for text in texts])
+        answered = [(index, result) for index, result in zip(todo, results) if result is not None]
+        if answered:
+            index = [index for index, _ in answered]
+            for key in LLM_COLUMNS[:-1]:
+                df.loc[index, key] = [result[key] for _, result in answered]
+            df.loc[index, 'keywords'] = ["; ".join(result['keywords']) for _, result in answered]
+        failed = len(todo) - len(answered)
+        if failed:
+            # Leave the shard unfinished so it is retried instead of merging holes
+            raise PartialShardError(df, f"{failed} of {len(df)} rows could not be classified")
+        return df
+
+    return classify
+
+
+# =============================================================================
+# Coordinator / worker / merge
+# =============================================================================
+def split(queue, job, input_path, workdir, shard_size, text_column='sentence'):
+    """Write shard input files and register them in the queue"""
+    input_dir = os.path.join(workdir, job, "input")
+    os.makedirs(input_dir, exist_ok=True)
+    shards = []
+    reader = pd.read_csv(input_path, chunksize=shard_size)
+    for shard_id, chunk in enumerate(reader):
+        chunk = chunk.dropna(subset=[text_column])
+        path = os.path.abspath(os.path.join(input_dir, f"shard-{shard_id:05d}.csv"))
+        chunk.to_csv(path, index=False)
+        shards.append((shard_id, path, len(chunk)))
+    queue.add_shards(job, shards)
+    print(f"✅ Job '{job}': {len(shards)} shards, {sum(rows for _, _, rows in shards):,} rows")
+    return shards
+
+
+class _LeaseKeeper(threading.Thread):
+    """Renews a lease in the background while the shard is being processed"""
+
+    def __init__(self, queue, job, shard_id, worker, lease_s):
+        super().__init__(daemon=True)
+        self.queue, self.job, self.shard_id, self.worker, self.lease_s = queue, job, shard_id, worker, lease_s
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        while not self.stopped.wait(self.lease_s / 3):
+            if not self.queue.renew(self.job, self.shard_id, self.worker, self.lease_s):
+                self.lost = True
+                return
+
+
+def work(queue, job, classify, workdir, worker=None, lease_s=DEFAULT_LEASE_S, max_shards=None, poll_s=0.0,
+         max_failures=DEFAULT_MAX_FAILURES, failure_backoff_s=DEFAULT_FAILURE_BACKOFF_S):
+    """
+    Claim and process shards until none are left (or max_shards is reached).
+    With poll_s > 0 the worker keeps polling for shards released by crashed workers.
+    Failed shards count towards max_shards; the worker backs off after each failure and
+    stops after max_failures in a row, so a broken node cannot use up every shard's attempts.
+    """
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    output_dir = os.path.join(workdir, job, "output")
+    os.makedirs(output_dir, exist_ok=True)
+    metrics = RunMetrics(f"work_queue-{job}-{worker}")
+    processed = 0
+    consecutive_failures = 0
+
+    while max_shards is None or processed < max_shards:
+        claimed = queue.claim(job, worker, lease_s)
+        if claimed is None:
+            if poll_s and not _job_finished(queue, job):
+                time.sleep(poll_s)
+                continue
+            break
+        shard_id, input_path = claimed
+        processed += 1
+        output_path = os.path.abspath(os.path.join(output_dir, f"shard-{shard_id:05d}.csv"))
+        partial_path = os.path.join(output_dir, f"shard-{shard_id:05d}.partial.csv")
+        keeper = _LeaseKeeper(queue, job, shard_id, worker, lease_s)
+        keeper.start()
+        try:
+            with metrics.stage(f"shard-{shard_id:05d}") as stage:
+                # Resume from the rows an earlier attempt already classified
+                df = pd.read_csv(partial_path if os.path.exists(partial_path) else input_path)
+                stage.rows_in = len(df)
+                df = classify(df)
+                stage.rows_out = len(df)
+                _write_atomic(df, output_path, worker)
+        except Exception as e:
+            keeper.stopped.set()
+            if isinstance(e, PartialShardError):
+                _write_atomic(e.df, partial_path, worker)
+            print(f"❌ Shard {shard_id} failed: {e}")
+            queue.fail(job, shard_id, worker, f"{type(e).__name__}: {e}")
+            consecutive_failures += 1
+            if consecutive_failures >= max_failures:
+                print(f"❌ {consecutive_failures} shards failed in a row, stopping worker {worker}")
+                break
+            time.sleep(failure_backoff_s * 2 ** (consecutive_failures - 1))
+            continue
+        keeper.stopped.set()
+        consecutive_failures = 0
+        if keeper.lost or not queue.complete(job, shard_id, worker, output_path):
+            print(f"⚠️ Lease on shard {shard_id} expired before completion; another worker owns it now")
+        else:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            print(f"✅ Shard {shard_id} done ({stage.rows_out:,} rows, {stage.wall_time_s:.1f}s)")
+
+    if metrics.stages:
+        metrics.save()
+    return processed
+
+
+def _write_atomic(df, path, worker):
+    tmp_path = f"{path}.{worker}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _job_finished(queue, job):
+    states = queue.shards(job)['state']
+    return bool(len(states)) and states.isin(['done', 'failed']).all()
+
+
+def status(queue, job):
+    shards = queue.shards(job)
+    if shards.empty:
+        print(f"Job '{job}' has no shards")
+        return shards
+    print(f"=== JOB '{job}' ===")
+    print(shards['state'].value_counts().to_string())
+    now = time.time()
+    leased = shards[shards['state'] == 'leased']
+    expired = leased[pd.to_numeric(leased['lease_until']) < now]
+    if len(expired):
+        print(f"⚠️ {len(expired)} leases expired (crashed workers?), shards: {expired['shard_id'].tolist()}")
+    return shards
+
+
+def merge(queue, job, output_path, allow_partial=False):
+    """Concatenate shard outputs in shard order into the labeled dataset"""
+    shards = queue.shards(job)
+    missing = shards[shards['state'] != 'done']
+    if len(missing) and not allow_partial:
+        raise RuntimeError(f"{len(missing)} shards of job '{job}' are not done: {missing['shard_id'].tolist()[:20]}")
+    done = shards[shards['state'] == 'done'].sort_values('shard_id')
+    if done.empty:
+        print(f"⚠️ No shards of job '{job}' are done yet, nothing to merge")
+        return
+    pd.concat((pd.read_csv(path) for path in done['output_path']), ignore_index=True).to_csv(output_path,
+                                                                                            index=False)
+    print(f"✅ Merged {len(done)} shards into {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shard sentence classification across worker processes")
+    parser.add_argument("command", choices=["split", "work", "status", "merge"])
+    parser.add_argument("--queue", required=True, help="sqlite:///queue.db or redis://host:6379/0")
+    parser.add_argument("--job", required=True)
+    parser.add_argument("--workdir", default="shards")
+    parser.add_argument("--input", help="split: expanded sentences CSV")
+    parser.add_argument("--shard-size", type=int, default=5000)
+    parser.add_argument("--text-column", default="sentence")
+    parser.add_argument("--classifier", choices=["zero-shot", "llm"], default="zero-shot")
+    parser.add_argument("--model", default=ZERO_SHOT_MODEL, help="zero-shot model name")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--llm-config", default="creds/llm_backends.yml")
+    parser.add_argument("--lease", type=float, default=DEFAULT_LEASE_S, help="lease length, seconds")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+    parser.add_argument("--poll", type=float, default=0.0,
+                        help="keep polling every N seconds until all shards are done")
+    parser.add_argument("--max-failures", type=int, default=DEFAULT_MAX_FAILURES,
+                        help="stop the worker after N shard failures in a row")
+    parser.add_argument("--failure-backoff", type=float, default=DEFAULT_FAILURE_BACKOFF_S,
+                        help="seconds to wait after a failure, doubled on each further failure")
+    parser.add_argument("--output", help="merge: labeled dataset CSV")
+    parser.add_argument("--allow-partial", action="store_true")
+    args = parser.parse_args()
+
+    queue = open_queue(args.queue, max_attempts=args.max_attempts)
+    if args.command == "split":
+        if not args.input:
+            sys.exit("split needs --input")
+        split(queue, args.job, args.input, args.workdir, args.shard_size, text_column=args.text_column)
+    elif args.command == "work":
+        if args.classifier == "zero-shot":
+            classify = make_zero_shot_classifier(args.model, args.batch_size, text_column=args.text_column)
+        else:
+            classify = make_llm_classifier(args.llm_config, text_column=args.text_column)
+        work(queue, args.job, classify, args.workdir, lease_s=args.lease, poll_s=args.poll,
+             max_failures=args.max_failures, failure_backoff_s=args.failure_backoff)
+    elif args.command == "status":
+        status(queue, args.job)
+    else:
+        if not args.output:
+            sys.exit("merge needs --output")
+        merge(queue, args.job, args.output, allow_partial=args.allow_partial)